@@ -1,26 +1,163 @@
-from flask import Flask, jsonify, request
+import time
+_import_started = time.perf_counter()
+import atexit
+import json
+import os
+import sys
+import uuid
+from flask import Flask, Response, abort, jsonify, request, stream_with_context
 
-app = Flask(__name__)
-@app.route('/Client/Chat.html', methods=['GET'])
-def chat_page():
+# The agent modules import each other by name from the API directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "API"))
+from dotenv import load_dotenv
+from Agent import CandidateAgent, Message
+from Job import Job
+from Session_Manager import SessionManager
+from Session_Store import SessionStore
+from Response_Cache import ResponseCache
+from Static_Assets import StaticAssets
+import Metrics
+
+"""
+# Server
+create_app builds the Flask app and its per-process state. The Gemini SDK and the job catalog
+load on first use unless preload is called first, which gunicorn.conf.py does in the master
+process so every worker shares them copy-on-write and starts answering warm.
+
+Run with: python API.py (development), flask --app API run, or gunicorn -c gunicorn.conf.py
+"""
+
+load_dotenv()
+
+SESSION_COOKIE = "session_id"
+
+SESSIONS_ACTIVE = Metrics.Gauge("sessions_active", "Sessions held in memory.")
+SESSIONS_BYTES = Metrics.Gauge("sessions_bytes", "Estimated memory held by sessions.")
+RESPONSE_CACHE_ENTRIES = Metrics.Gauge("response_cache_entries", "Responses held in the in-memory response cache.")
+IMPORT_SECONDS = Metrics.Gauge("app_import_seconds", "Time spent importing the server's modules.")
+PRELOAD_SECONDS = Metrics.Gauge("app_preload_seconds", "Time spent loading the SDK and job catalog before serving.")
+BOOT_SECONDS = Metrics.Gauge("app_boot_seconds", "Time create_app took to build the app, including preloading.")
+
+IMPORT_SECONDS.set(time.perf_counter() - _import_started)
+
+def preload() -> None:
+    """
+    Loads the Gemini SDK, the candidate agent's generation config, the job catalog and the
+    semantic search index, which requests otherwise load on first use.
+    Safe to call before forking: it starts no threads and opens no connections.
     """
-    # New user workflow
-    Landing page 
-    Instantiates empty candidate.
-    Instantiates new Candidate agent.
-    Agent calls setter instance methods of the candidate to update information.
+    started = time.perf_counter()
+    CandidateAgent.preload()
+    Job.job_source()
+    from Job_Search import JobIndex
+    JobIndex.default()
+    PRELOAD_SECONDS.set(time.perf_counter() - started)
+
+def create_app(preload_resources: bool | None = None) -> Flask:
+    """
+    Builds the app with its own session store, session manager and response cache.
+
+    Args:
+        preload_resources (bool | None): Call preload first, unless it already ran in this process.
+            Defaults to the APP_PRELOAD environment variable being "1".
     """
-    with open("Client/Chat.html") as html_file:
-        return html_file.read()
+    started = time.perf_counter()
+    if preload_resources is None:
+        preload_resources = os.environ.get("APP_PRELOAD") == "1"
+    if preload_resources and not PRELOAD_SECONDS.value():
+        preload()
+
+    app = Flask(__name__)
+
+    # One candidate and candidate agent per browser session, created on first message
+    # and saved in the background so it survives eviction and restarts
+    session_store = SessionStore()
+    atexit.register(session_store.close)
+    # Identical requests, such as every new candidate's first message, share one model call
+    response_cache = ResponseCache(directory=os.environ.get("RESPONSE_CACHE_DIR"))
+    sessions = SessionManager(
+        str(os.environ.get("GOOGLE_API_KEY")),
+        store=session_store,
+        response_cache=response_cache,
+        # Keeps the instructions and function declarations in Gemini's context cache
+        prompt_cache=os.environ.get("GEMINI_PROMPT_CACHE") == "1",
+    )
+
+    # Client pages and stylesheets, held in memory
+    assets = StaticAssets("Client")
+
+    @app.route('/Client/<path:name>', methods=['GET'])
+    def client_asset(name: str):
+        """
+        # New user workflow
+        Landing page (Client/chat.html)
+        Instantiates empty candidate.
+        Instantiates new Candidate agent.
+        Agent calls setter instance methods of the candidate to update information.
+        """
+        if app.debug:
+            assets.reload_if_changed()
+        result = assets.respond(name, request.headers, request.args.get("v"))
+        if result is None:
+            abort(404)
+        status, body, headers = result
+        return Response(body, status=status, headers=headers)
+
+    @app.route("/API/get_response", methods=['POST', 'GET'])
+    def get_agent_response():
+        """
+        Sends the user's message to their agent.
+
+        With stream=1 the response is relayed as Server-Sent Events while the model generates it:
+        one "data: {"chunk": ...}" event per chunk followed by a "done" event.
+        Otherwise the full response is returned as JSON once it is ready.
+        """
+        user_message = request.values.get("user_message", "")
+        message = Message("Candidate", "Agent", user_message)
+        session_id = request.cookies.get(SESSION_COOKIE) or uuid.uuid4().hex
+
+        if request.values.get("stream") != "1":
+            with sessions.session(session_id) as session:
+                response = jsonify({"response": session.agent.get_response(message)})
+        else:
+            def events():
+                # The session stays locked until the whole response has been streamed
+                with sessions.session(session_id) as session:
+                    for chunk in session.agent.get_response_stream(message):
+                        yield f"data: {json.dumps({'chunk': chunk})}\n\n"
+                yield "event: done\ndata: {}\n\n"
+
+            # X-Accel-Buffering stops reverse proxies from holding chunks back
+            response = Response(stream_with_context(events()), mimetype="text/event-stream",
+                                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+        response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite="Lax")
+        return response
+
+    @app.route("/metrics", methods=['GET'])
+    def metrics():
+        """
+        Prometheus scrape endpoint for turn, model, tool and job query metrics.
+        """
+        SESSIONS_ACTIVE.set(len(sessions))
+        SESSIONS_BYTES.set(sessions.get_total_bytes())
+        RESPONSE_CACHE_ENTRIES.set(len(response_cache))
+        return Response(Metrics.render(), mimetype="text/plain; version=0.0.4")
+
+    @app.route("/metrics/slow_turns", methods=['GET'])
+    def slow_turns():
+        """
+        Returns the most recent turns slower than Metrics.SLOW_TURN_SECONDS with where their time went.
+        """
+        return jsonify(Metrics.slow_turns())
 
-@app.route("/API/get_response", methods=['POST', 'GET'])
-def get_agent_response():
-    user_message = request.form.get("user_message")
-    return jsonify({"response": user_message})
+    @app.route('/api/test', methods=['GET'])
+    def test():
+        return jsonify({"status": "API is working"})
 
-@app.route('/api/test', methods=['GET'])
-def test():
-    return jsonify({"status": "API is working"})
+    BOOT_SECONDS.set(time.perf_counter() - started)
+    print(f"Booted in {BOOT_SECONDS.value():.2f}s (imports {IMPORT_SECONDS.value():.2f}s, preload {PRELOAD_SECONDS.value():.2f}s) in process {os.getpid()}")
+    return app
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    create_app().run(debug=True, port=5000)
@@ -1,10 +1,44 @@
+from __future__ import annotations
+import asyncio
+import contextvars
+import hashlib
+import sys
+import time
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 from dataclasses import dataclass
-from typing import List
-from google import genai
-from google.genai import types
+from typing import Callable, Dict, Iterator, List, TYPE_CHECKING
+import httpx
 from Candidate import *
 from Gemini_Functions import *
+from Tool_Registry import ToolRegistry
+from Job_History import JobHistory
+from Gemini_Client import get_client, preload_sdk
+from Response_Cache import ResponseCache
+from Prompt_Cache import PromptCache
+from Context_Window import ContextWindow, DEFAULT_TOKEN_BUDGET, DEFAULT_KEEP_LAST, estimate_tokens
+from Gemini_Scheduler import Scheduler, INTERACTIVE, BACKGROUND, BATCH
+import Metrics
+
+if TYPE_CHECKING:
+    from google import genai
+    from google.genai import types
+    from Job_Matcher import Matches
+    from Session_Store import SessionStore
+
+MODEL = "gemini-2.0-flash-001"
+# Cheaper model used for background work such as summarizing old conversation turns
+SUMMARY_MODEL = "gemini-2.0-flash-lite-001"
+# Shared by all agents to run independent function calls from one response in parallel
+TOOL_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="tool")
+# Limits on one user turn, so every request finishes in bounded time
+MAX_TOOL_HOPS = 5
+TURN_DEADLINE_SECONDS = 30.0
+FALLBACK_RESPONSE = "Sorry, I couldn't finish working on that in time. Could you ask again, or tell me a little more about what you're looking for?"
+# Generation configs keyed by declaration names, built once per set of functions
+_generation_configs: Dict[tuple[str, ...], types.GenerateContentConfig] = {}
+SUMMARY_INSTRUCTIONS = "Summarize the conversation below for an AI agent that will continue it. Merge it into the existing summary if one is given. Keep every fact the candidate shared and every job that was discussed. Reply with the summary only."
 
 """
 # Context format
@@ -18,15 +52,34 @@ Conversation history
 
 """
 
-@dataclass
+def _api_errors() -> tuple[type[Exception], ...]:
+    """
+    Errors Gemini answers a request with, imported only once a request has failed.
+    The last call of a turn falls back on these instead of failing the whole request.
+    """
+    from google.genai import errors
+    return (errors.APIError,)
+
+@dataclass(frozen=True, slots=True)
 class Message:
     """
     Represents a message used for prompting agents and storing a conversation history.
+    Immutable and slotted, as every session keeps every message it has seen.
+    Sender and recipient are interned since there are only a handful of distinct ones.
     """
     sender: str
     recipient: str
     content: str
 
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "sender", sys.intern(self.sender))
+        object.__setattr__(self, "recipient", sys.intern(self.recipient))
+
+class TurnDeadlineExceeded(TimeoutError):
+    """
+    Raised inside a turn when it runs out of time before the next model call or mid-stream.
+    """
+
 @abstractmethod
 class Agent:
     """
@@ -40,76 +93,387 @@ class Agent:
         __client (genai.Client): Google Gemini API client instance.
         __behavioral_instructions (str): Instructions that define how the agent should
             behave during conversations and negotiations.
-        __conversation_history (List[Dict[str, str]]): Chronological record of all
-            conversations. Each entry contains timestamp, role, and message.
+        __conversation_history (List[Message]): Chronological record of all
+            conversations.
+        __rendered_history (List[str]): Append-only buffer holding each message of the
+            conversation history already formatted as a line of the transcript.
+        __context (List[str] | None): Cached context, rebuilt only after it is invalidated.
+        __context_window (ContextWindow): Token-budgeted part of the conversation history that
+            is sent to the model. Older turns are folded into a running summary.
 
     Args:
         gemini_api_key (str): API key for accessing the Google Gemini service.
+        token_budget (int): Approximate number of tokens of verbatim history sent to the model.
+        keep_last (int): Number of most recent messages that are always sent verbatim.
+        client (genai.Client | None): Client to use instead of the shared process-wide client.
+        response_cache (ResponseCache | None): Cache for responses to identical requests.
+        prompt_cache (bool): Keep the behavioral instructions and function declarations in
+            Gemini's server-side context cache instead of sending them with every request.
+        max_tool_hops (int): Maximum rounds of function calls the model can make in one turn.
+        turn_deadline_seconds (float): Wall-clock limit on one turn, including function calls.
+        scheduler (Scheduler | None): Scheduler to use instead of the shared process-wide one.
+        priority (int): Scheduler lane of the agent's replies. Summaries always run as BACKGROUND.
     """
-    def __init__(self, gemini_api_key: str) -> None:
-
-        # Client instantiation
-        self.__client = genai.Client(api_key=gemini_api_key)
+    def __init__(self, gemini_api_key: str, token_budget: int = DEFAULT_TOKEN_BUDGET, keep_last: int = DEFAULT_KEEP_LAST, client: genai.Client | None = None, response_cache: ResponseCache | None = None, prompt_cache: bool = False, max_tool_hops: int = MAX_TOOL_HOPS, turn_deadline_seconds: float = TURN_DEADLINE_SECONDS, scheduler: Scheduler | None = None, priority: int = INTERACTIVE) -> None:
+
+        # All agents share one pooled client unless one is injected
+        self.__client = client or get_client(gemini_api_key)
+        self.__response_cache = response_cache
+        self.__prompt_cache = prompt_cache
+        self.__max_tool_hops = max_tool_hops
+        self.__turn_deadline_seconds = turn_deadline_seconds
+        # Every model call in the process is admitted by one scheduler unless one is injected
+        self.__scheduler = scheduler or Scheduler.default()
+        self.__priority = priority
 
         self.__behavioral_instructions = "Respond to the last message in the conversation. Ensure you call the provided setter functions whenever a user divuldges new information. Do not announce your function calls to the user. The conversation history is for your reference. Do not attempt to copy the to-from formatting it uses in your messages to the user."
-        self.__conversation_history: List[Message] = []    
+        self.__conversation_history: List[Message] = []
+        self.__rendered_history: List[str] = []
+        self.__history_characters = 0
+        self.__message_listener: Callable[[int, Message], None] | None = None
+        self.__conversation_history_str: str | None = ""
+        self.__context: List[str] | None = None
+        self.__context_window = ContextWindow(
+            self.summarize_conversation,
+            token_budget=token_budget,
+            keep_last=keep_last,
+            on_change=self.__summary_changed,
+        )
+        self.__summary_listener: Callable[[str, int], None] | None = None
 
     @property
-    def context(self):
+    def context(self) -> List[str]:
         """
         Get the current context for the agent.
 
+        The context is cached and only rebuilt after invalidate_context is called,
+        which happens whenever the conversation history or instructions change.
+
         Returns:
             List[str]: A list containing the behavioral instructions and the formatted conversation history string.
         """
-        return [self.__behavioral_instructions, self.get_conversation_history_str()]
+        if self.__context is None:
+            self.__context = self.build_context()
+        return self.__context
+
+    def build_context(self) -> List[str]:
+        """
+        Builds the context from scratch. Child classes override this to add their own sections,
+        keeping the behavioral instructions first so they can be served from the prompt cache.
+        """
+        return [self.__behavioral_instructions, self.get_context_history_str()]
+
+    def invalidate_context(self) -> None:
+        """
+        Drops the cached context so the next access rebuilds it.
+        """
+        self.__context = None
 
-    
     def get_response(self, message: Message, functions = []) -> str:
         """
         Gets a response from gemini
 
+        Function calls the model makes are run and the model is reprompted with their results,
+        at most max_tool_hops times and within turn_deadline_seconds of the message arriving.
+        Out of hops, the model is asked to answer without calling functions, and FALLBACK_RESPONSE
+        is returned if that call fails. Out of time, the in-flight model call is abandoned and
+        FALLBACK_RESPONSE is returned.
+
         Args:
             message (Message): Message to send
         
         Returns:
             AI model response.
         """
-        self.add_conversation(message)
-        
-        # Get response from Gemini
-        # for when functions are passed. used in CandidateAgent overload
-        if functions != []:
-            tools = types.Tool(function_declarations=functions) # type: ignore
-            config =  types.GenerateContentConfig(tools=[tools])
-            response = self.__client.models.generate_content(model = "gemini-2.0-flash-001",
-                                                            contents = self.context, # type: ignore
-                                                            config = config)
-        else:
-            response = self.__client.models.generate_content(model = "gemini-2.0-flash-001",
-                                                contents = self.context) # type: ignore
+        with Metrics.turn(type(self).__name__):
+            deadline = time.monotonic() + self.__turn_deadline_seconds
+            self.add_conversation(message)
+            prompt = message
+            try:
+                for hop in range(self.__max_tool_hops + 1):
+                    response = self.__generate(functions, deadline)
+                    # Check to see if the model called any functions
+                    function_calls = Agent.get_function_calls(response)
+                    if not function_calls:
+                        return self.__record_response(prompt, response)
+                    if hop == self.__max_tool_hops:
+                        break
+                    prompt = self.execute_gemini_function_calls(function_calls)
+                try:
+                    response = self.__generate(functions, deadline, function_calling = False)
+                except _api_errors():
+                    return self.__fallback(message, "max_tool_hops")
+                return self.__final_response(message, prompt, response)
+            except (TimeoutError, httpx.TimeoutException):
+                return self.__fallback(message, "deadline")
+
+    async def get_response_async(self, message: Message, functions = []) -> str:
+        """
+        Gets a response from gemini without blocking the event loop.
 
-        # Check to see which function was called by model
-        if not response.candidates[0].content.parts[0].function_call: #type: ignore
-            response_text = str(response.text)
+        Uses the shared client's async API, so one worker can hold many conversations at once.
+        Limits are the same as get_response; a model call still running at the deadline is cancelled.
+
+        Args:
+            message (Message): Message to send
         
-            # Add the response to conversation history
-            # TODO add cases that allow for more than a two way conversation. IE user sends to agent, agent sends to all
-            response_message = Message(sender = message.recipient, recipient = message.sender, content = response_text)
-            self.add_conversation(response_message)
+        Returns:
+            AI model response.
+        """
+        with Metrics.turn(type(self).__name__):
+            deadline = time.monotonic() + self.__turn_deadline_seconds
+            self.add_conversation(message)
+            prompt = message
+            try:
+                for hop in range(self.__max_tool_hops + 1):
+                    response = await self.__generate_async(functions, deadline)
+                    function_calls = Agent.get_function_calls(response)
+                    if not function_calls:
+                        return self.__record_response(prompt, response)
+                    if hop == self.__max_tool_hops:
+                        break
+                    prompt = await self.execute_gemini_function_calls_async(function_calls)
+                try:
+                    response = await self.__generate_async(functions, deadline, function_calling = False)
+                except _api_errors():
+                    return self.__fallback(message, "max_tool_hops")
+                return self.__final_response(message, prompt, response)
+            except (TimeoutError, httpx.TimeoutException):
+                return self.__fallback(message, "deadline")
+
+    def get_response_stream(self, message: Message, functions = []) -> Iterator[str]:
+        """
+        Gets a response from gemini as a stream of text chunks, so callers can relay the
+        first tokens as soon as the model produces them.
 
-            return response_text
+        Function calls in the stream are executed once the stream ends and the follow-up
+        response is streamed in turn. Limits are the same as get_response; if the deadline
+        passes mid-stream, the text already streamed is kept as the response.
+
+        Args:
+            message (Message): Message to send
         
-        else:
-            return self.execute_gemini_function_calls(response)
+        Yields:
+            str: Chunks of the AI model response.
+        """
+        with Metrics.turn(type(self).__name__):
+            deadline = time.monotonic() + self.__turn_deadline_seconds
+            self.add_conversation(message)
+            prompt = message
+            response_chunks: List[str] = []
+            try:
+                for hop in range(self.__max_tool_hops + 1):
+                    response_chunks = []
+                    function_calls = []
+                    # Streams are admitted but not retried or shared, as chunks go straight to the caller
+                    self.__scheduler.admit(self.__priority, self.__estimate_tokens(), deadline)
+                    contents, config = self.__request(functions, deadline)
+                    # Model latency here includes the time the caller spends relaying each chunk
+                    with Metrics.model_call(MODEL, contents), closing(self.__client.models.generate_content_stream(model = MODEL,
+                                                                                                                  contents = contents, # type: ignore
+                                                                                                                  config = config)) as stream:
+                        for chunk in stream:
+                            chunk_calls = Agent.get_function_calls(chunk)
+                            if chunk_calls:
+                                function_calls.extend(chunk_calls)
+                            elif chunk.text:
+                                response_chunks.append(chunk.text)
+                                yield chunk.text
+                            if time.monotonic() > deadline:
+                                raise TurnDeadlineExceeded("Turn deadline passed while streaming")
+
+                    if not function_calls:
+                        self.add_conversation(Message(sender = prompt.recipient, recipient = prompt.sender, content = "".join(response_chunks)))
+                        return
+                    if hop == self.__max_tool_hops:
+                        break
+                    prompt = self.execute_gemini_function_calls(function_calls)
+                try:
+                    response = self.__generate(functions, deadline, function_calling = False)
+                except _api_errors():
+                    yield self.__fallback(message, "max_tool_hops")
+                    return
+                yield self.__final_response(message, prompt, response)
+            except (TimeoutError, httpx.TimeoutException):
+                if response_chunks:
+                    # The user already has part of the answer, keep it rather than apologizing
+                    Metrics.TURN_FALLBACKS.inc(reason = "deadline")
+                    self.add_conversation(Message(sender = prompt.recipient, recipient = prompt.sender, content = "".join(response_chunks)))
+                else:
+                    yield self.__fallback(message, "deadline")
+
+    @staticmethod
+    def generation_config(functions: list) -> types.GenerateContentConfig | None:
+        """
+        Returns the config that exposes functions to the model, or None if there are none.
+
+        Converting the declarations takes about a millisecond, so each set is converted once.
+        The config is shared and must be copied, not modified.
+        """
+        if functions == []:
+            return None
+        names = tuple(function["name"] for function in functions)
+        config = _generation_configs.get(names)
+        if config is None:
+            from google.genai import types
+            tools = types.Tool(function_declarations=functions) # type: ignore
+            config = _generation_configs.setdefault(names, types.GenerateContentConfig(tools=[tools]))
+        return config
+
+    def __request(self, functions: list, deadline: float, function_calling: bool = True) -> tuple[List[str], types.GenerateContentConfig]:
+        """
+        Returns the contents and config for the next model request.
+
+        With the prompt cache enabled and available, the behavioral instructions and functions
+        are referenced by cached content name and left out of the contents. Gemini rejects a
+        tool_config alongside cached content, so requests that turn function calling off always
+        send the full context.
+        The HTTP request times out at the turn's deadline.
+
+        Raises:
+            TurnDeadlineExceeded: If the deadline has already passed.
+        """
+        from google.genai import types
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TurnDeadlineExceeded("Turn deadline passed before the model call")
+
+        contents = self.context
+        config = None
+        if self.__prompt_cache and function_calling:
+            config = PromptCache.for_prefix(self.__client, MODEL, self.__behavioral_instructions, functions).config()
+            if config is not None:
+                contents = self.context[1:]
+        if config is None:
+            config = Agent.generation_config(functions) or types.GenerateContentConfig()
+        update: dict = {"http_options": types.HttpOptions(timeout = max(1, int(remaining * 1000)))}
+        if not function_calling and functions != []:
+            update["tool_config"] = types.ToolConfig(function_calling_config = types.FunctionCallingConfig(mode = types.FunctionCallingConfigMode.NONE))
+        return contents, config.model_copy(update = update)
+
+    def __generate(self, functions: list, deadline: float, function_calling: bool = True):
+        """
+        Gets the model's response to the current context, unless the same request was answered before.
+        """
+        cache_key, response = self.__cached_response(functions) if function_calling else (None, None)
+        if response is None:
+            def call():
+                # Built once admitted, so the HTTP timeout covers only what is left of the turn
+                contents, config = self.__request(functions, deadline, function_calling)
+                with Metrics.model_call(MODEL, contents):
+                    return self.__client.models.generate_content(model = MODEL,
+                                                                  contents = contents, # type: ignore
+                                                                  config = config)
+            response = self.__scheduler.submit(call, self.__priority, self.__estimate_tokens(),
+                                               key = self.__request_key(functions, function_calling, cache_key), deadline = deadline)
+            self.__cache_response(cache_key, response)
+        return response
+
+    async def __generate_async(self, functions: list, deadline: float, function_calling: bool = True):
+        """
+        Async counterpart of __generate. The model call is cancelled if it runs past the deadline.
+        """
+        cache_key, response = self.__cached_response(functions) if function_calling else (None, None)
+        if response is None:
+            async def call():
+                contents, config = self.__request(functions, deadline, function_calling)
+                with Metrics.model_call(MODEL, contents):
+                    return await asyncio.wait_for(self.__client.aio.models.generate_content(model = MODEL,
+                                                                                            contents = contents, # type: ignore
+                                                                                            config = config),
+                                                  timeout = deadline - time.monotonic())
+            response = await self.__scheduler.submit_async(call, self.__priority, self.__estimate_tokens(),
+                                                           key = self.__request_key(functions, function_calling, cache_key), deadline = deadline)
+            self.__cache_response(cache_key, response)
+        return response
+
+    def __estimate_tokens(self) -> int:
+        return sum(estimate_tokens(item) for item in self.context)
+
+    def __request_key(self, functions: list, function_calling: bool, cache_key: str | None) -> str:
+        """
+        Identifies the request, so identical requests from other agents in flight at the same time share one call.
+        """
+        if cache_key is None:
+            # Declarations are fixed per agent class, so their names stand in for them
+            names = ",".join(function["name"] for function in functions)
+            cache_key = hashlib.sha256("\n".join([MODEL, names, *self.context]).encode("utf-8")).hexdigest()
+        return f"{cache_key}:{function_calling}"
+
+    def __cached_response(self, functions: list) -> tuple[str | None, object | None]:
+        """
+        Returns the cache key for the current request and its cached response, if any.
+        """
+        if self.__response_cache is None:
+            return None, None
+        cache_key = ResponseCache.key(MODEL, functions, self.context)
+        return cache_key, self.__response_cache.get(cache_key)
+
+    def __cache_response(self, cache_key: str | None, response) -> None:
+        if self.__response_cache is not None and cache_key is not None:
+            self.__response_cache.put(cache_key, response)
+
+    def __record_response(self, message: Message, response) -> str:
+        response_text = str(response.text)
+
+        # Add the response to conversation history
+        # TODO add cases that allow for more than a two way conversation. IE user sends to agent, agent sends to all
+        response_message = Message(sender = message.recipient, recipient = message.sender, content = response_text)
+        self.add_conversation(response_message)
+
+        return response_text
+
+    def __final_response(self, message: Message, prompt: Message, response) -> str:
+        """
+        Records the answer the model gave once the turn ran out of tool hops.
+        Falls back if the model still produced no text.
+        """
+        if Agent.get_function_calls(response) or not response.text:
+            return self.__fallback(message, "max_tool_hops")
+        return self.__record_response(prompt, response)
+
+    def __fallback(self, message: Message, reason: str) -> str:
+        """
+        Answers the user with FALLBACK_RESPONSE when a turn hits one of its limits.
+        """
+        Metrics.TURN_FALLBACKS.inc(reason = reason)
+        trace = Metrics.current_turn()
+        if trace is not None:
+            trace.fallback = reason
+        response_message = Message(sender = message.recipient, recipient = message.sender, content = FALLBACK_RESPONSE)
+        self.add_conversation(response_message)
+        return FALLBACK_RESPONSE
+
+    @staticmethod
+    def get_function_calls(response) -> list:
+        """
+        Returns every function call the model made in a response, in order.
+        """
+        # Stream chunks may carry no candidate or content at all
+        if not response.candidates or not response.candidates[0].content:
+            return []
+        parts = response.candidates[0].content.parts or []
+        return [part.function_call for part in parts if part.function_call]
 
     @abstractmethod
-    def execute_gemini_function_calls(self, response) -> str:
+    def execute_gemini_function_calls(self, function_calls: list) -> Message:
         """
+        Runs the function calls from one model response and adds them and their results to the
+        conversation history.
         This needs to be abstract because CandidateAgents and RecruitingAgents have different functions they can call.
+
+        Returns:
+            Message: The last result message, which the model's next response answers.
         """
         pass
 
+    async def execute_gemini_function_calls_async(self, function_calls: list) -> Message:
+        """
+        Async counterpart of execute_gemini_function_calls.
+        Child classes should override this; by default the synchronous version runs on a worker thread.
+        """
+        return await asyncio.to_thread(self.execute_gemini_function_calls, function_calls)
+
     def add_conversation(self, message) -> None:
         """
         Append a Message object to the agent's conversation history.
@@ -117,19 +481,105 @@ class Agent:
         Args:
             message (Message): The Message instance to add to the conversation history.
         """
+        self.__context_window.append(self.__add_to_history(message))
+        self.invalidate_context()
+        if self.__message_listener is not None:
+            self.__message_listener(len(self.__conversation_history) - 1, message)
+
+    def __add_to_history(self, message: Message) -> str:
+        """
+        Appends a message to the full conversation history and returns its rendered line.
+        """
+        rendered_message = f"From {message.sender} to {message.recipient}: {message.content}\n"
         self.__conversation_history.append(message)
+        self.__rendered_history.append(rendered_message)
+        self.__history_characters += len(rendered_message)
+        self.__conversation_history_str = None
+        return rendered_message
+
+    def set_message_listener(self, listener: Callable[[int, Message], None] | None) -> None:
+        """
+        Registers a callback that runs with each message's position and the message after it is
+        added to the conversation history, for example to persist it.
+        It runs on the caller's thread so it should only queue work.
+        """
+        self.__message_listener = listener
+
+    def set_summary_listener(self, listener: Callable[[str, int], None] | None) -> None:
+        """
+        Registers a callback that runs with the new conversation summary and its fold point,
+        the number of messages it replaces, whenever a summary lands, for example to persist it.
+        It runs on the context window's background thread so it should only queue work.
+        """
+        self.__summary_listener = listener
+
+    def __summary_changed(self) -> None:
+        self.invalidate_context()
+        if self.__summary_listener is not None:
+            self.__summary_listener(*self.__context_window.state())
+
+    def load_conversation_history(self, messages: List[Message], summary: str = "", folded: int = 0) -> None:
+        """
+        Restores a saved conversation history without notifying the message listener.
+
+        Args:
+            messages (List[Message]): The saved messages.
+            summary (str): The saved conversation summary, if any.
+            folded (int): Number of messages, from the first, the summary replaces.
+        """
+        for message in messages:
+            self.__add_to_history(message)
+        self.__context_window.restore(summary, folded, self.__rendered_history)
+        self.invalidate_context()
 
     def get_conversation_history_str(self) -> str:
         """
         Get the agent's conversation history as a formatted string.
 
+        Each message is formatted once when it is added, so this only joins the
+        rendered lines, and only when a message was added since the last call.
+
         Returns:
             str: The conversation history, formatted as "From {sender} to {recipient}: {content}" per line.
         """
-        conversation_string = ""
-        for message in self.__conversation_history:
-            conversation_string += f"From {message.sender} to {message.recipient}: {message.content}\n"
-        return conversation_string
+        if self.__conversation_history_str is None:
+            self.__conversation_history_str = "".join(self.__rendered_history)
+        return self.__conversation_history_str
+
+    def get_history_characters(self) -> int:
+        """
+        Returns the length of the rendered conversation history without joining it.
+        """
+        return self.__history_characters
+
+    def get_context_history_str(self) -> str:
+        """
+        Get the part of the conversation history that is sent to the model.
+
+        Returns:
+            str: A summary of older turns, if any, followed by the most recent messages verbatim.
+        """
+        return self.__context_window.render()
+
+    def summarize_conversation(self, summary: str, transcript: str) -> str:
+        """
+        Folds transcript lines into the running conversation summary with a cheaper model.
+        Runs on the context window's background thread.
+
+        Args:
+            summary (str): The current summary, empty if there is none yet.
+            transcript (str): Formatted conversation lines to fold into the summary.
+
+        Returns:
+            str: The new summary.
+        """
+        contents = [SUMMARY_INSTRUCTIONS, f"Existing summary: {summary}", transcript]
+        def call():
+            with Metrics.model_call(SUMMARY_MODEL, contents):
+                return self.__client.models.generate_content(model = SUMMARY_MODEL,
+                                                             contents = contents)
+        response = self.__scheduler.submit(call, BACKGROUND, sum(estimate_tokens(item) for item in contents))
+        return str(response.text)
 
     def update_behavioral_instructions(self, new_instructions: str) -> None:
         """
@@ -141,6 +591,7 @@ class Agent:
             new_instructions (str): Instructions to supplement the default agent behaviors.
         """
         self.__behavioral_instructions += new_instructions
+        self.invalidate_context()
 
     def get_behavioral_instructions(self) -> str:
         """
@@ -156,6 +607,11 @@ class CandidateAgent(Agent):
     """
     __CandidateAgent_functions = [
         query_jobs_declaration,
+        semantic_query_jobs_declaration,
+        shortlist_job_declaration,
+        reject_job_declaration,
+        record_offer_declaration,
+        get_shortlist_declaration,
         set_candidate_ideal_salary_declaration,
         set_candidate_minimum_salary_declaration,
         set_candidate_location_declaration,
@@ -167,91 +623,156 @@ class CandidateAgent(Agent):
         set_candidate_education_declaration,
         set_candidate_skills_declaration
     ]
+    # Built once at import time, maps each declaration name to its callable
+    __CandidateAgent_tools = ToolRegistry(__CandidateAgent_functions, roots={"self.job_history": JobHistory, "self.candidate": Candidate})
 
-    def __init__(self, candidate: Candidate, gemini_api_key: str) -> None:
-        super().__init__(gemini_api_key)
+    def __init__(self, candidate: Candidate, gemini_api_key: str, client: genai.Client | None = None, response_cache: ResponseCache | None = None, prompt_cache: bool = False, max_tool_hops: int = MAX_TOOL_HOPS, turn_deadline_seconds: float = TURN_DEADLINE_SECONDS, scheduler: Scheduler | None = None) -> None:
+        super().__init__(gemini_api_key, client=client, response_cache=response_cache, prompt_cache=prompt_cache, max_tool_hops=max_tool_hops, turn_deadline_seconds=turn_deadline_seconds, scheduler=scheduler)
         self.candidate = candidate
-        self.__position_shortlist = []
-        self.__position_offers = []
-        self.update_behavioral_instructions("You are a job searching agent having a conversation with the candidate you represent. Your goal is to aquire information about a candidates qualifications and job desires, save this info with the setter functions, and help the candidate find a suitable job with the query_jobs function.")
+        self.__candidate_revision = candidate.get_revision()
+        # Jobs already shown, shortlisted, rejected or offered, which job queries leave out
+        self.job_history = JobHistory()
+        self.update_behavioral_instructions("You are a job searching agent having a conversation with the candidate you represent. Your goal is to aquire information about a candidates qualifications and job desires, save this info with the setter functions, and help the candidate find a suitable job with the query_jobs and semantic_query_jobs functions. Shortlist jobs the candidate likes, reject the ones they don't and record any offers they receive.")
     
     @property
     def context(self) -> list[str]:
-        return [super().get_behavioral_instructions(), str(self.candidate), super().get_conversation_history_str()]
+        # Rebuild the cached context only when the candidate profile changed
+        revision = self.candidate.get_revision()
+        if revision != self.__candidate_revision:
+            self.__candidate_revision = revision
+            self.invalidate_context()
+        return super().context
+
+    def build_context(self) -> list[str]:
+        return [super().get_behavioral_instructions(), str(self.candidate), super().get_context_history_str()]
     
+    @classmethod
+    def get_tool_registry(cls) -> ToolRegistry:
+        """
+        Returns the registry all CandidateAgents dispatch function calls through, for per-tool stats.
+        """
+        return cls.__CandidateAgent_tools
+
+    @classmethod
+    def preload(cls) -> None:
+        """
+        Imports the SDK and builds the generation config ahead of the first turn,
+        so a server can do it once before forking workers.
+        """
+        preload_sdk()
+        Agent.generation_config(cls.__CandidateAgent_functions)
+
+    def load_conversation_history(self, messages: List[Message], summary: str = "", folded: int = 0, job_history: JobHistory | None = None) -> None:
+        """
+        Restores a saved conversation history, summary and job history.
+        """
+        super().load_conversation_history(messages, summary, folded)
+        if job_history is not None:
+            self.job_history = job_history
+
     def get_response(self, message: Message, functions = __CandidateAgent_functions) -> str:
         return super().get_response(message=message, functions=functions)
 
-    def execute_gemini_function_calls(self, response) -> str:
+    async def get_response_async(self, message: Message, functions = __CandidateAgent_functions) -> str:
+        return await super().get_response_async(message=message, functions=functions)
+
+    def get_response_stream(self, message: Message, functions = __CandidateAgent_functions) -> Iterator[str]:
+        return super().get_response_stream(message=message, functions=functions)
+
+    def execute_gemini_function_calls(self, function_calls: list) -> Message:
         """
         Automatically updates the conversation history with the request message from AI to service and service to AI.
-        Automatically reprompts AI with the response message from the service.
-        Returns the final str response of the model once it has viewed the function response message.
-        """
-
-        # parse actual function call from response
-        function_call = response.candidates[0].content.parts[0].function_call # type: ignore
-        print(f"AGENT CALLED {function_call.name}({function_call.args})")
-
-        # EXTREAMLY UNSAFE 
-        # Basically lets gemini evalate functions completly unsupervised and unsanitized
-        # A user could potentially evaluate whatever code they please with this by passing the correct arguments
-
-        argument_string = ""
-        for key, value in function_call.args.items():
-            if type(value) == str:
-                argument_string += f"{key} = \"{value}\", "
-            else:
-                argument_string += f"{key} = {value}, "
-        argument_string = argument_string[:-2] # delete that last comma
-        function_call_string = f"{function_call.name}({argument_string})"
-        print(function_call_string)
-        result = eval(function_call_string)
-        request_message = Message("Agent", "API", function_call_string)
-        response_message = Message("API", "Agent", result)
-        self.add_conversation(request_message)
-        return self.get_response(response_message)
-
-
-        """
-        if function_call.name == "query_jobs": # type: ignore
-            # get arguments
-            minimum_salary = function_call.args["minimum_salary"] # type: ignore
-            location = function_call.args["location"] # type: ignore
-
-            # Actually call the function with the arguments provided by LLM
-            matching_jobs = Job.query_jobs(minimum_salary, location)
-
-            # Update the conversation to include the agents request to the job 
-            job_request_message = Message("Agent", "Job Database", f"query_jobs({minimum_salary}, {location})")
-            job_response_message = Message("Job Database", "Agent", matching_jobs)
-            self.add_conversation(job_request_message)
-            # reprompt gemini with new message
-            return self.get_response(job_response_message)
-        
-        elif function_call.name == "set_candidate_ideal_salary":
-            # set the candidates ideal salary
-            ideal_salary = function_call.args["ideal_salary"]
-            self.__candidate.set_ideal_salary(ideal_salary)
-            
-            # update conversation history
-            set_ideal_salary_message = Message("Agent", "Candidate Database", f"Candidate.set_ideal_salary({ideal_salary})")
-            set_ideal_salary_response = Message("Candidate Database", "Agent", f"Successfully set salary to {ideal_salary}")
-            self.add_conversation(set_ideal_salary_message)
-            # reprompt
-            return self.get_response(set_ideal_salary_response)
-        
+        Returns the last response message from the service; Agent.get_response then reprompts the model.
+
+        Every function call in the response is executed before the model is reprompted,
+        so a round of calls costs one model round-trip however many calls the model makes.
+        Multiple calls run in parallel on TOOL_EXECUTOR.
+        """
+        if len(function_calls) == 1:
+            results = [self.__run_function_call(function_calls[0])]
         else:
-            return ""
+            # Each call runs in a copy of this context so it is traced as part of the current turn
+            contexts = [contextvars.copy_context() for _ in function_calls]
+            results = list(TOOL_EXECUTOR.map(lambda context, function_call: context.run(self.__run_function_call, function_call), contexts, function_calls))
+        return self.__record_function_results(results)
+
+    async def execute_gemini_function_calls_async(self, function_calls: list) -> Message:
+        """
+        Async counterpart of execute_gemini_function_calls.
+        Function calls run on TOOL_EXECUTOR so they never block the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*[
+            loop.run_in_executor(TOOL_EXECUTOR, contextvars.copy_context().run, self.__run_function_call, function_call)
+            for function_call in function_calls
+        ])
+        return self.__record_function_results(list(results))
+
+    def __record_function_results(self, results: list[tuple[Message, Message]]) -> Message:
+        """
+        Adds every request and response message to the conversation history and returns the
+        last response, which the model's next response answers.
+        """
+        # All results go back to the model in a single follow-up request
+        for request_message, response_message in results:
+            self.add_conversation(request_message)
+            self.add_conversation(response_message)
+        return results[-1][1]
+
+    def __run_function_call(self, function_call) -> tuple[Message, Message]:
         """
+        Runs one function call from the model through the CandidateAgent tool registry.
+
+        Returns:
+            tuple[Message, Message]: The request message from the agent and the response message from the API.
+        """
+        args = dict(function_call.args or {})
+        try:
+            result = self.__CandidateAgent_tools.dispatch(self, function_call.name, args)
+        except Exception as error:
+            # Let the model see the failure instead of losing the other calls' results
+            result = f"Error: {error}"
+        argument_string = ", ".join(f"{key} = {value!r}" for key, value in args.items())
+        request_message = Message("Agent", "API", f"{function_call.name}({argument_string})")
+        response_message = Message("API", "Agent", "Success" if result is None else result)
+        return request_message, response_message
 
 class RecruitingAgent(Agent):
     """
-    
+    AI agent that represents a recruiter filling a set of jobs.
+
+    Its candidate shortlist comes from the batch matcher (Job_Matcher.match), directly or
+    through the shortlists it saves to the session store.
+
+    Args:
+        gemini_api_key (str): API key for accessing the Google Gemini service.
+        job_ids (List[int] | None): IDs of the jobs the recruiter is hiring for.
+        client (genai.Client | None): Client to use instead of the shared process-wide client.
     """
-    def __init__(self, gemini_api_key: str) -> None:
-        super().__init__(gemini_api_key)
-        self.__candidate_short_list = []
+    def __init__(self, gemini_api_key: str, job_ids: List[int] | None = None, client: genai.Client | None = None) -> None:
+        # Recruiter conversations are driven by batch matching, not a waiting user
+        super().__init__(gemini_api_key, client=client, priority=BATCH)
+        self.__job_ids = list(job_ids or [])
+        # job ID -> (candidate ID, score) pairs, best first
+        self.__candidate_short_list: Dict[int, List[tuple[int, float]]] = {}
         self.__secured_candidate = []
         self.update_behavioral_instructions("")
+
+    def get_job_ids(self) -> List[int]:
+        return self.__job_ids
+
+    def update_candidate_short_list(self, matches: "Matches") -> None:
+        """
+        Replaces the shortlist with the top candidates the batch matcher found for each of the recruiter's jobs.
+        """
+        self.__candidate_short_list = {job_id: matches.shortlist(job_id) for job_id in self.__job_ids}
+
+    def load_candidate_short_list(self, store: SessionStore) -> None:
+        """
+        Replaces the shortlist with the one the last batch matcher run saved for each of the recruiter's jobs.
+        """
+        self.__candidate_short_list = store.load_shortlists(self.__job_ids)
+
+    def get_candidate_short_list(self) -> Dict[int, List[tuple[int, float]]]:
+        return self.__candidate_short_list
     
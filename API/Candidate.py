@@ -1,10 +1,12 @@
 from __future__ import annotations
-from typing import Optional, List, Dict
+import sys
+from typing import Callable, Optional, List, Dict
 from dataclasses import dataclass
 from datetime import datetime
 from Job import Job
+from Id_Allocator import IdAllocator
 
-@dataclass
+@dataclass(slots=True)
 class JobDesires:
     """
     Standard and semantic job preferences for a candidate.
@@ -21,6 +23,10 @@ class JobDesires:
     company_culture: Optional[str] = None
     responsibilities: Optional[str] = None
     
+    def __post_init__(self):
+        if self.location is not None:
+            self.location = sys.intern(self.location)
+
     def set_ideal_salary(self, salary: int):
         self.ideal_salary = salary
 
@@ -28,7 +34,7 @@ class JobDesires:
         self.minimum_salary = salary
 
     def set_location(self, location: str):
-        self.location = location
+        self.location = sys.intern(location)
 
     def set_position(self, position: str):
         self.position = position
@@ -45,7 +51,7 @@ class JobDesires:
     def __str__(self):
         return f"Ideal salary: {self.ideal_salary}, Minimum salary: {self.minimum_salary} location: {self.location}, position: {self.position}, description: {self.job_description}, company culture: {self.company_culture}, responsibilities: {self.responsibilities}"
 
-@dataclass
+@dataclass(slots=True)
 class Qualifications:
     """
     Candidate's work experience and qualifications
@@ -71,7 +77,8 @@ class Candidate:
     Represents a job candidate with their preferences, qualifications, and AI agent.
     This class implements the structure shown in the system diagram.
     """
-    __candidate_count = 0
+    # Shared with every worker process so IDs survive restarts without colliding
+    __ids = IdAllocator("candidate")
 
     def __init__(
         self,
@@ -93,10 +100,8 @@ class Candidate:
             id: Optional unique identifier
         """
         
-        # ID inc.
         if id is None:
-            Candidate.__candidate_count += 1
-            self.__id = Candidate.__candidate_count
+            self.__id = Candidate.__ids.next_id()
         else:
             self.__id = id
 
@@ -105,38 +110,83 @@ class Candidate:
         self.__job_desires = job_desires or JobDesires()
         self.__qualifications = qualifications or Qualifications([], [], [])
         self.__offers: List[Job] = []  # List of job offers received
+        self.__revision = 0  # Bumped by every setter so agents know when to rebuild their context
+        self.__change_listener: Optional[Callable[[Candidate], None]] = None
         
     # --- JobDesires setters ---
     def set_ideal_salary(self, ideal_salary: int):
         self.__job_desires.set_ideal_salary(ideal_salary)
+        self.__changed()
 
     def set_minimum_salary(self, minimum_salary: int):
         self.__job_desires.set_minimum_salary(minimum_salary)
+        self.__changed()
 
     def set_location(self, location: str):
         self.__job_desires.set_location(location)
+        self.__changed()
 
     def set_position(self, position: str):
         self.__job_desires.set_position(position)
+        self.__changed()
 
     def set_job_description(self, description: str):
         self.__job_desires.set_job_description(description)
+        self.__changed()
 
     def set_company_culture(self, company_culture: str):
         self.__job_desires.set_company_culture(company_culture)
+        self.__changed()
 
     def set_responsibilities(self, responsibilities: str):
         self.__job_desires.set_responsibilities(responsibilities)
+        self.__changed()
 
     # --- Qualifications setters ---
     def set_work_experience(self, work_experience: list[str]):
         self.__qualifications.set_work_experience(work_experience)
+        self.__changed()
 
     def set_education(self, education: list[str]):
         self.__qualifications.set_education(education)
+        self.__changed()
 
     def set_skills(self, skills: list[str]):
         self.__qualifications.set_skills(skills)
+        self.__changed()
+
+    def __changed(self) -> None:
+        self.__revision += 1
+        if self.__change_listener is not None:
+            self.__change_listener(self)
+
+    def set_change_listener(self, listener: Optional[Callable[[Candidate], None]]) -> None:
+        """
+        Registers a callback that runs after every setter, for example to persist the profile.
+        It runs on the caller's thread so it should only queue work.
+        """
+        self.__change_listener = listener
+
+    def get_id(self) -> int:
+        return self.__id
+
+    def get_name(self) -> str:
+        return self.__name
+
+    def get_email(self) -> str:
+        return self.__email
+
+    def get_job_desires(self) -> JobDesires:
+        return self.__job_desires
+
+    def get_qualifications(self) -> Qualifications:
+        return self.__qualifications
+
+    def get_revision(self) -> int:
+        """
+        Returns a counter that changes whenever the candidate's profile is updated.
+        """
+        return self.__revision
 
     def __str__(self):
         return f"{self.__name} wants a job with the following information:\n{str(self.__job_desires)}\nThe candidate has the following qualifications: {str(self.__qualifications)}"
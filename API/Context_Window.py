@@ -0,0 +1,196 @@
+from __future__ import annotations
+import logging
+import threading
+import time
+from typing import Callable, List
+import Metrics
+
+"""
+# Context window
+Keeps the part of a conversation that is sent to the model within a token budget.
+The most recent messages stay verbatim, older ones are folded into a running summary
+by a background thread so the user's turn never waits on summarization.
+After a failed summary, the next attempt waits with exponential backoff. If the verbatim
+lines reach MAX_BUDGET_MULTIPLE times the budget meanwhile, the oldest are dropped.
+The summary and the number of lines it replaces (the fold point) can be saved with state and
+handed back to restore, so a reloaded conversation isn't summarized again.
+"""
+
+DEFAULT_TOKEN_BUDGET = 4000
+DEFAULT_KEEP_LAST = 12
+# Rough average for English text, good enough for budgeting
+CHARACTERS_PER_TOKEN = 4
+# Retry delay after a failed summary, doubled after each further failure
+SUMMARY_RETRY_SECONDS = 5.0
+SUMMARY_RETRY_MAX_SECONDS = 300.0
+# Verbatim history past this many times the token budget is dropped, oldest first
+MAX_BUDGET_MULTIPLE = 4
+
+logger = logging.getLogger(__name__)
+SUMMARY_FAILURES = Metrics.Counter("context_summary_failures_total", "Conversation summaries that failed, leaving the lines verbatim until a retry.")
+DROPPED_LINES = Metrics.Counter("context_dropped_lines_total", "Transcript lines dropped unsummarized because the verbatim history was far over budget.")
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARACTERS_PER_TOKEN + 1
+
+class ContextWindow:
+    """
+    Token-budgeted view of a conversation transcript.
+
+    Once the verbatim lines exceed token_budget, everything but the last keep_last lines
+    is handed to summarize on a background thread. When the new summary is ready it
+    replaces those lines and on_change is called.
+
+    Args:
+        summarize (Callable[[str, str], str]): Takes the current summary and the transcript
+            lines to fold in, and returns the new summary.
+        token_budget (int): Approximate number of tokens of verbatim history to keep.
+        keep_last (int): Number of most recent lines that are never summarized.
+        on_change (Callable[[], None] | None): Called after a summary replaces verbatim lines.
+    """
+    def __init__(
+        self,
+        summarize: Callable[[str, str], str],
+        token_budget: int = DEFAULT_TOKEN_BUDGET,
+        keep_last: int = DEFAULT_KEEP_LAST,
+        on_change: Callable[[], None] | None = None,
+    ) -> None:
+        self.__summarize = summarize
+        self.__token_budget = token_budget
+        self.__keep_last = keep_last
+        self.__on_change = on_change
+
+        self.__lock = threading.Lock()
+        self.__summary = ""
+        self.__lines: List[str] = []
+        self.__line_tokens: List[int] = []
+        self.__verbatim_tokens = 0
+        self.__rendered: str | None = ""
+        self.__summarizing = False
+        # Transcript lines no longer verbatim, summarized or dropped
+        self.__folded = 0
+        # Lines dropped from the front since the running summary started
+        self.__dropped_while_summarizing = 0
+        self.__failures = 0
+        self.__retry_at = 0.0
+
+    def append(self, line: str) -> None:
+        """
+        Adds a rendered transcript line and starts a summary if the budget is exceeded.
+        """
+        with self.__lock:
+            tokens = estimate_tokens(line)
+            self.__lines.append(line)
+            self.__line_tokens.append(tokens)
+            self.__verbatim_tokens += tokens
+            self.__rendered = None
+            if self.__verbatim_tokens > MAX_BUDGET_MULTIPLE * self.__token_budget:
+                self.__drop_oldest()
+        self.__maybe_summarize()
+
+    def render(self) -> str:
+        """
+        Returns the summary followed by the verbatim lines.
+        """
+        with self.__lock:
+            if self.__rendered is None:
+                summary = f"Summary of the earlier conversation: {self.__summary}\n" if self.__summary else ""
+                self.__rendered = summary + "".join(self.__lines)
+            return self.__rendered
+
+    def get_summary(self) -> str:
+        return self.__summary
+
+    def state(self) -> tuple[str, int]:
+        """
+        Returns the summary and how many transcript lines, from the first, it replaces.
+        """
+        with self.__lock:
+            return self.__summary, self.__folded
+
+    def restore(self, summary: str, folded: int, lines: List[str]) -> None:
+        """
+        Replaces the window with a saved summary and the transcript lines after its fold point.
+
+        Args:
+            summary (str): Summary saved with state.
+            folded (int): Fold point saved with state.
+            lines (List[str]): The whole rendered transcript, including the folded lines.
+        """
+        with self.__lock:
+            self.__summary = summary
+            self.__folded = min(folded, len(lines))
+            self.__lines = list(lines[self.__folded:])
+            self.__line_tokens = [estimate_tokens(line) for line in self.__lines]
+            self.__verbatim_tokens = sum(self.__line_tokens)
+            self.__rendered = None
+            if self.__verbatim_tokens > MAX_BUDGET_MULTIPLE * self.__token_budget:
+                self.__drop_oldest()
+        self.__maybe_summarize()
+
+    def get_verbatim_tokens(self) -> int:
+        return self.__verbatim_tokens
+
+    def is_summarizing(self) -> bool:
+        return self.__summarizing
+
+    def __drop_oldest(self) -> None:
+        """
+        Drops the oldest lines, down to the budget or the last keep_last lines. Caller holds
+        self.__lock. A running summary may be folding some of them, so it is told how many went.
+        """
+        dropped = 0
+        while len(self.__lines) - dropped > self.__keep_last and self.__verbatim_tokens > self.__token_budget:
+            self.__verbatim_tokens -= self.__line_tokens[dropped]
+            dropped += 1
+        del self.__lines[:dropped]
+        del self.__line_tokens[:dropped]
+        self.__folded += dropped
+        if self.__summarizing:
+            self.__dropped_while_summarizing += dropped
+        DROPPED_LINES.inc(dropped)
+
+    def __maybe_summarize(self) -> None:
+        with self.__lock:
+            if (
+                self.__summarizing
+                or self.__verbatim_tokens <= self.__token_budget
+                or len(self.__lines) <= self.__keep_last
+                or time.monotonic() < self.__retry_at
+            ):
+                return
+            self.__summarizing = True
+            self.__dropped_while_summarizing = 0
+            folded = self.__lines[:len(self.__lines) - self.__keep_last]
+            summary = self.__summary
+        threading.Thread(target=self.__fold, args=(summary, folded), daemon=True).start()
+
+    def __fold(self, summary: str, folded: List[str]) -> None:
+        try:
+            new_summary = self.__summarize(summary, "".join(folded))
+        except Exception as error:
+            # Keep the lines verbatim, the first append after the backoff will try again
+            SUMMARY_FAILURES.inc(error=type(error).__name__)
+            with self.__lock:
+                self.__summarizing = False
+                retry_seconds = min(SUMMARY_RETRY_MAX_SECONDS, SUMMARY_RETRY_SECONDS * 2 ** self.__failures)
+                self.__retry_at = time.monotonic() + retry_seconds
+                self.__failures += 1
+            logger.warning("Conversation summary failed, retrying in %.0fs: %s", retry_seconds, error)
+            return
+
+        with self.__lock:
+            # The folded lines not dropped meanwhile are still at the front
+            remaining = max(0, len(folded) - self.__dropped_while_summarizing)
+            del self.__lines[:remaining]
+            self.__verbatim_tokens -= sum(self.__line_tokens[:remaining])
+            del self.__line_tokens[:remaining]
+            self.__folded += remaining
+            self.__summary = new_summary
+            self.__rendered = None
+            self.__summarizing = False
+            self.__failures = 0
+
+        if self.__on_change is not None:
+            self.__on_change()
+        self.__maybe_summarize()
@@ -0,0 +1,128 @@
+from __future__ import annotations
+import asyncio
+import threading
+from typing import Any, Callable, Iterator, List
+from google.genai import types
+
+"""
+# Fake Gemini client
+In-process stand-in for genai.Client that agents can be constructed with (client=...),
+for benchmarks and offline runs. Responses come from a script: either a list of recorded
+responses replayed in order, or a function that picks a response from the request contents.
+
+RecordingClient wraps a real client and saves every response it receives, so a live
+session can be replayed offline with FakeClient.from_recording.
+"""
+
+def text_response(text: str) -> types.GenerateContentResponse:
+    return types.GenerateContentResponse(candidates=[types.Candidate(
+        content=types.Content(role="model", parts=[types.Part(text=text)]),
+        finish_reason=types.FinishReason.STOP,
+    )])
+
+def function_call_response(*calls: tuple[str, dict]) -> types.GenerateContentResponse:
+    """
+    Builds a response that calls each (name, args) pair in one turn.
+    """
+    return types.GenerateContentResponse(candidates=[types.Candidate(
+        content=types.Content(role="model", parts=[
+            types.Part(function_call=types.FunctionCall(name=name, args=args)) for name, args in calls
+        ]),
+        finish_reason=types.FinishReason.STOP,
+    )])
+
+class _FakeModels:
+    def __init__(self, client: FakeClient) -> None:
+        self.__client = client
+
+    def generate_content(self, model: str, contents: Any, config: Any = None) -> types.GenerateContentResponse:
+        return self.__client.respond(model, contents)
+
+    def generate_content_stream(self, model: str, contents: Any, config: Any = None) -> Iterator[types.GenerateContentResponse]:
+        yield self.__client.respond(model, contents)
+
+class _FakeAsyncModels:
+    def __init__(self, client: FakeClient) -> None:
+        self.__client = client
+
+    async def generate_content(self, model: str, contents: Any, config: Any = None) -> types.GenerateContentResponse:
+        await asyncio.sleep(self.__client.latency_seconds)
+        return self.__client.respond(model, contents, sleep=False)
+
+class _FakeAio:
+    def __init__(self, client: FakeClient) -> None:
+        self.models = _FakeAsyncModels(client)
+
+class _FakeCaches:
+    def create(self, model: str, config: Any = None) -> types.CachedContent:
+        return types.CachedContent(name="cachedContents/fake", model=model)
+
+    def update(self, name: str, config: Any = None) -> types.CachedContent:
+        return types.CachedContent(name=name)
+
+class FakeClient:
+    """
+    Scripted replacement for genai.Client.
+
+    Args:
+        script (list | Callable[[Any], GenerateContentResponse]): Responses replayed in order
+            (cycling when exhausted), or a function from the request contents to a response.
+        latency_seconds (float): Simulated model latency per call.
+    """
+    def __init__(self, script: List[types.GenerateContentResponse] | Callable[[Any], types.GenerateContentResponse], latency_seconds: float = 0.0) -> None:
+        self.__script = script
+        self.__position = 0
+        self.__lock = threading.Lock()
+        self.latency_seconds = latency_seconds
+        self.models = _FakeModels(self)
+        self.aio = _FakeAio(self)
+        self.caches = _FakeCaches()
+
+        self.calls = 0
+        self.request_characters = 0
+
+    @classmethod
+    def from_recording(cls, path: str, latency_seconds: float = 0.0) -> FakeClient:
+        """
+        Loads responses saved by RecordingClient, one JSON response per line.
+        """
+        with open(path) as recording:
+            responses = [types.GenerateContentResponse.model_validate_json(line) for line in recording if line.strip()]
+        return cls(responses, latency_seconds)
+
+    def respond(self, model: str, contents: Any, sleep: bool = True) -> types.GenerateContentResponse:
+        if sleep and self.latency_seconds:
+            threading.Event().wait(self.latency_seconds)
+        with self.__lock:
+            self.calls += 1
+            self.request_characters += sum(len(str(content)) for content in contents) if isinstance(contents, list) else len(str(contents))
+            if callable(self.__script):
+                return self.__script(contents)
+            response = self.__script[self.__position % len(self.__script)]
+            self.__position += 1
+            return response
+
+class RecordingClient:
+    """
+    Wraps a genai.Client and appends every generate_content response to a JSONL file.
+
+    Args:
+        client (genai.Client): The real client.
+        path (str): File the responses are appended to.
+    """
+    def __init__(self, client: Any, path: str) -> None:
+        self.__client = client
+        self.__path = path
+        self.__lock = threading.Lock()
+        self.models = self
+        self.aio = client.aio
+        self.caches = client.caches
+
+    def generate_content(self, model: str, contents: Any, config: Any = None) -> Any:
+        response = self.__client.models.generate_content(model=model, contents=contents, config=config)
+        with self.__lock, open(self.__path, "a") as recording:
+            recording.write(response.model_dump_json(exclude_none=True) + "\n")
+        return response
+
+    def generate_content_stream(self, model: str, contents: Any, config: Any = None) -> Iterator[Any]:
+        return self.__client.models.generate_content_stream(model=model, contents=contents, config=config)
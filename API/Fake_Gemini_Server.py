@@ -0,0 +1,111 @@
+from __future__ import annotations
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+"""
+# Fake Gemini server
+A local stand-in for the generateContent endpoint, for exercising agents without network access.
+Every request is answered with a text reply that echoes the last content it was sent,
+after an optional delay that simulates model latency.
+streamGenerateContent requests get the same reply as Server-Sent Events, one word per event.
+cachedContents can be created and have their TTL updated, and the server counts the bytes
+of generateContent requests it receives so the savings of the prompt cache can be measured.
+
+Run with: python API/Fake_Gemini_Server.py [port] [delay_seconds]
+Then start the API with GEMINI_BASE_URL=http://localhost:<port>
+"""
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    delay_seconds = 0.0
+    protocol_version = "HTTP/1.1"
+
+    # Shared by every handler thread
+    stats_lock = threading.Lock()
+    generate_requests = 0
+    generate_request_bytes = 0
+    cached_contents: dict[str, dict] = {}
+
+    def __read_body(self) -> tuple[dict, int]:
+        raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        return json.loads(raw or b"{}"), len(raw)
+
+    def do_PATCH(self) -> None:
+        body, _ = self.__read_body()
+        name = self.path.split("?")[0].split("/v1beta/")[-1]
+        self.__send_json({**self.cached_contents.get(name, {"name": name}), **body})
+
+    def do_POST(self) -> None:
+        body, body_bytes = self.__read_body()
+        if self.path.split("?")[0].endswith("/cachedContents"):
+            with FakeGeminiHandler.stats_lock:
+                name = f"cachedContents/fake-{len(FakeGeminiHandler.cached_contents)}"
+                FakeGeminiHandler.cached_contents[name] = {"name": name, "model": body.get("model")}
+            self.__send_json(FakeGeminiHandler.cached_contents[name])
+            return
+
+        with FakeGeminiHandler.stats_lock:
+            FakeGeminiHandler.generate_requests += 1
+            FakeGeminiHandler.generate_request_bytes += body_bytes
+        time.sleep(self.delay_seconds)
+
+        contents = body.get("contents") or [{}]
+        last_parts = contents[-1].get("parts") or [{}]
+        last_text = str(last_parts[-1].get("text", ""))
+        reply_text = f"Fake reply to: {last_text[-200:]}"
+        if ":streamGenerateContent" in self.path:
+            self.__send_stream(reply_text)
+        else:
+            self.__send_json(self.__response(reply_text, len(json.dumps(contents)) // 4))
+
+    @staticmethod
+    def __response(text: str, prompt_tokens: int = 0) -> dict:
+        return {
+            "candidates": [{
+                "content": {"role": "model", "parts": [{"text": text}]},
+                "finishReason": "STOP",
+            }],
+            "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": len(text) // 4},
+        }
+
+    def __send_json(self, reply: dict) -> None:
+        encoded = json.dumps(reply).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def __send_stream(self, text: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for word in text.split(" "):
+            event = f"data: {json.dumps(self.__response(word + ' '))}\r\n\r\n"
+            self.wfile.write(event.encode("utf-8"))
+            self.wfile.flush()
+        self.close_connection = True
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+class FakeGeminiServer(ThreadingHTTPServer):
+    # The default backlog of 5 resets connections under concurrent load
+    request_queue_size = 1024
+    daemon_threads = True
+
+def serve(port: int = 8765, delay_seconds: float = 0.0) -> FakeGeminiServer:
+    """
+    Creates the fake server. Call serve_forever on the result, usually from a thread.
+    """
+    FakeGeminiHandler.delay_seconds = delay_seconds
+    return FakeGeminiServer(("localhost", port), FakeGeminiHandler)
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    delay_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+    print(f"Fake Gemini listening on http://localhost:{port}")
+    serve(port, delay_seconds).serve_forever()
@@ -0,0 +1,55 @@
+from __future__ import annotations
+import threading
+from os import environ
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from google import genai
+
+"""
+# Shared Gemini client
+One genai.Client per API key per process. Every agent reuses its connection pools
+instead of opening new connections for each conversation.
+
+GEMINI_BASE_URL points the client at another server, such as a local fake model server.
+GEMINI_MAX_CONNECTIONS caps the number of pooled connections per pool.
+The SDK takes most of a second to import, so it is imported by the first get_client call,
+or ahead of time by preload_sdk.
+"""
+
+MAX_CONNECTIONS = int(environ.get("GEMINI_MAX_CONNECTIONS", "200"))
+
+_clients: dict[str, genai.Client] = {}
+_clients_lock = threading.Lock()
+
+def get_client(api_key: str) -> genai.Client:
+    """
+    Returns the process-wide client for api_key, creating it on first use.
+
+    Args:
+        api_key (str): API key for accessing the Google Gemini service.
+    """
+    client = _clients.get(api_key)
+    if client is not None:
+        return client
+    with _clients_lock:
+        if api_key not in _clients:
+            import httpx
+            from google import genai
+            from google.genai import types
+            limits = httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS)
+            http_options = types.HttpOptions(
+                base_url=environ.get("GEMINI_BASE_URL"),
+                client_args={"limits": limits},
+                async_client_args={"limits": limits},
+            )
+            _clients[api_key] = genai.Client(api_key=api_key, http_options=http_options)
+        return _clients[api_key]
+
+def preload_sdk() -> None:
+    """
+    Imports the SDK without creating a client, for a server to call before forking workers.
+    Clients hold connection pools, so each worker still creates its own.
+    """
+    from google import genai
+    from google.genai import types
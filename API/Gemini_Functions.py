@@ -2,10 +2,10 @@ from Job import Job
 
 # all declarations are for candidate agent
 
-# Job class method
+# JobHistory instance methods, which leave out jobs the candidate has already seen
 query_jobs_declaration = {
-    "name": "Job.query_jobs",
-    "description": "Returns a list of string representations job listings that meet the minimum salary and location.",
+    "name": "self.job_history.query_jobs",
+    "description": "Returns one page of string representations of job listings that meet the minimum salary and location, closest to the ideal salary first. Jobs the candidate has already seen, shortlisted or rejected are left out and the result says how many. If more jobs match, the result ends with a cursor for the next page.",
     "parameters": {
         "type": "object",
         "properties": {
@@ -16,12 +16,89 @@ query_jobs_declaration = {
             "location": {
                 "type": "string",
                 "description": "The city where a candidate wants to find their new job."
+            },
+            "ideal_salary": {
+                "type": "integer",
+                "description": "The candidate's ideal salary. Jobs closest to it are returned first."
+            },
+            "cursor": {
+                "type": "string",
+                "description": "The cursor returned by a previous query_jobs call, to fetch the next page of the same search."
             }
         },
         "required": ["minimum_salary", "location"]
     }
 }
 
+semantic_query_jobs_declaration = {
+    "name": "self.job_history.semantic_query_jobs",
+    "description": "Returns string representations of the job listings whose descriptions best match a free text description of the job, company culture and responsibilities the candidate wants. Jobs the candidate has already seen are left out.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "description": {
+                "type": "string",
+                "description": "A description of the job, company culture and responsibilities the candidate is looking for."
+            }
+        },
+        "required": ["description"]
+    }
+}
+
+shortlist_job_declaration = {
+    "name": "self.job_history.shortlist_job",
+    "description": "Adds a job the candidate is interested in to their shortlist.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "job_id": {
+                "type": "integer",
+                "description": "The job's number, shown as No. in job listings."
+            }
+        },
+        "required": ["job_id"]
+    }
+}
+
+reject_job_declaration = {
+    "name": "self.job_history.reject_job",
+    "description": "Records that the candidate is not interested in a job, removing it from the shortlist.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "job_id": {
+                "type": "integer",
+                "description": "The job's number, shown as No. in job listings."
+            }
+        },
+        "required": ["job_id"]
+    }
+}
+
+record_offer_declaration = {
+    "name": "self.job_history.record_offer",
+    "description": "Records that the candidate received an offer for a job.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "job_id": {
+                "type": "integer",
+                "description": "The job's number, shown as No. in job listings."
+            },
+            "salary": {
+                "type": "integer",
+                "description": "The salary offered, if the candidate shared it."
+            }
+        },
+        "required": ["job_id"]
+    }
+}
+
+get_shortlist_declaration = {
+    "name": "self.job_history.get_shortlist",
+    "description": "Returns the candidate's shortlisted jobs and offers as string representations of job listings."
+}
+
 # JobDesires instance method
 set_candidate_ideal_salary_declaration = {
     "name": "self.candidate.set_ideal_salary",
@@ -0,0 +1,317 @@
+from __future__ import annotations
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import suppress
+from os import environ
+from typing import Any, Awaitable, Callable, TypeVar
+import Metrics
+
+"""
+# Gemini scheduler
+Every model call in the process goes through one scheduler, which keeps the process under
+its requests-per-minute and tokens-per-minute quota.
+
+Calls wait in priority lanes, so interactive chat is admitted before background summaries,
+and those before batch work. A call is admitted once it is first in line and both token
+buckets can cover it. Failed calls with a 429 or 5xx status are retried with jittered
+exponential backoff. A 429 also empties the request bucket, so every waiting call slows down
+instead of hammering the quota.
+Identical requests in flight at the same time share a single call.
+Async callers wait in the same line on their event loop, without holding a thread.
+
+GEMINI_RPM and GEMINI_TPM set the quota, defaulting to the paid tier 1 limits of Gemini 2.0 Flash.
+"""
+
+T = TypeVar("T")
+
+INTERACTIVE = 0
+BACKGROUND = 1
+BATCH = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background", BATCH: "batch"}
+
+REQUESTS_PER_MINUTE = int(environ.get("GEMINI_RPM", "2000"))
+TOKENS_PER_MINUTE = int(environ.get("GEMINI_TPM", "4000000"))
+MAX_RETRIES = 4
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 16.0
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+QUEUE_SECONDS = Metrics.Histogram("gemini_queue_seconds", "Time model calls wait for the scheduler to admit them.")
+RETRIES = Metrics.Counter("gemini_retries_total", "Model calls retried after a 429 or 5xx response.")
+COALESCED = Metrics.Counter("gemini_coalesced_total", "Model calls answered by an identical call already in flight.")
+
+class TokenBucket:
+    """
+    Refills continuously at rate_per_minute up to one minute's worth.
+    The level can go negative when a call turns out to use more than was taken for it.
+    """
+    def __init__(self, rate_per_minute: float) -> None:
+        self.__rate = rate_per_minute / 60.0
+        self.__capacity = float(rate_per_minute)
+        self.__level = self.__capacity
+        self.__updated = time.monotonic()
+
+    def __refill(self) -> None:
+        now = time.monotonic()
+        self.__level = min(self.__capacity, self.__level + (now - self.__updated) * self.__rate)
+        self.__updated = now
+
+    def wait_seconds(self, amount: float) -> float:
+        """
+        Returns how long until amount can be taken, 0 if it can be taken now.
+        """
+        self.__refill()
+        # A call larger than the whole bucket only waits for a full bucket
+        amount = min(amount, self.__capacity)
+        return max(0.0, (amount - self.__level) / self.__rate)
+
+    def take(self, amount: float) -> None:
+        self.__refill()
+        self.__level -= amount
+
+    def drain(self) -> None:
+        self.__refill()
+        self.__level = min(self.__level, 0.0)
+
+def _wake(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+def _status_code(error: BaseException) -> int | None:
+    # google.genai.errors.APIError carries the HTTP status as code
+    code = getattr(error, "code", None)
+    return code if isinstance(code, int) else None
+
+class Scheduler:
+    """
+    Admission control, retries and coalescing for model calls.
+
+    Args:
+        requests_per_minute (int): Request quota.
+        tokens_per_minute (int): Token quota.
+        max_retries (int): Retries of a call after a 429 or 5xx response.
+    """
+    __default: Scheduler | None = None
+    __default_lock = threading.Lock()
+
+    def __init__(self, requests_per_minute: int = REQUESTS_PER_MINUTE, tokens_per_minute: int = TOKENS_PER_MINUTE, max_retries: int = MAX_RETRIES) -> None:
+        self.__requests = TokenBucket(requests_per_minute)
+        self.__tokens = TokenBucket(tokens_per_minute)
+        self.__max_retries = max_retries
+        self.__condition = threading.Condition()
+        # (priority, arrival) of every call waiting for admission
+        self.__waiting: list[tuple[int, int]] = []
+        self.__arrivals = itertools.count()
+        # Ticket -> (loop, future) of every async call currently waiting to be woken
+        self.__async_waiters: dict[tuple[int, int], tuple[asyncio.AbstractEventLoop, asyncio.Future]] = {}
+        self.__in_flight: dict[str, Future] = {}
+        self.__in_flight_lock = threading.Lock()
+
+    @classmethod
+    def default(cls) -> Scheduler:
+        """
+        Returns the process-wide scheduler, creating it on first use.
+        """
+        if cls.__default is None:
+            with cls.__default_lock:
+                if cls.__default is None:
+                    cls.__default = cls()
+        return cls.__default
+
+    def admit(self, priority: int = INTERACTIVE, tokens: int = 0, deadline: float | None = None) -> None:
+        """
+        Blocks until the call is first in line and the quota covers it, then takes its share.
+
+        Args:
+            priority (int): INTERACTIVE, BACKGROUND or BATCH.
+            tokens (int): Estimated tokens of the request.
+            deadline (float | None): time.monotonic() after which to stop waiting.
+
+        Raises:
+            TimeoutError: If the deadline passes first.
+        """
+        started = time.monotonic()
+        ticket = (priority, next(self.__arrivals))
+        with self.__condition:
+            heapq.heappush(self.__waiting, ticket)
+            try:
+                while True:
+                    wait = None
+                    if self.__waiting[0] == ticket:
+                        wait = max(self.__requests.wait_seconds(1), self.__tokens.wait_seconds(tokens))
+                        if wait == 0:
+                            self.__requests.take(1)
+                            self.__tokens.take(tokens)
+                            break
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise TimeoutError("Deadline passed while waiting for the model quota")
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self.__condition.wait(wait)
+            finally:
+                self.__leave(ticket)
+        QUEUE_SECONDS.observe(time.monotonic() - started, priority=PRIORITY_NAMES.get(priority, str(priority)))
+
+    async def admit_async(self, priority: int = INTERACTIVE, tokens: int = 0, deadline: float | None = None) -> None:
+        """
+        Async counterpart of admit. Waits in the same line on the event loop instead of a thread.
+
+        Raises:
+            TimeoutError: If the deadline passes first.
+        """
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        ticket = (priority, next(self.__arrivals))
+        with self.__condition:
+            heapq.heappush(self.__waiting, ticket)
+        try:
+            while True:
+                with self.__condition:
+                    wait = None
+                    if self.__waiting[0] == ticket:
+                        wait = max(self.__requests.wait_seconds(1), self.__tokens.wait_seconds(tokens))
+                        if wait == 0:
+                            self.__requests.take(1)
+                            self.__tokens.take(tokens)
+                            break
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise TimeoutError("Deadline passed while waiting for the model quota")
+                        wait = remaining if wait is None else min(wait, remaining)
+                    # Registered under the lock, so a notification can't slip in before the await
+                    woken = loop.create_future()
+                    self.__async_waiters[ticket] = (loop, woken)
+                try:
+                    await asyncio.wait_for(woken, wait)
+                except TimeoutError:
+                    pass
+        finally:
+            with self.__condition:
+                self.__async_waiters.pop(ticket, None)
+                self.__leave(ticket)
+        QUEUE_SECONDS.observe(time.monotonic() - started, priority=PRIORITY_NAMES.get(priority, str(priority)))
+
+    def __leave(self, ticket: tuple[int, int]) -> None:
+        """
+        Takes a call out of line and wakes every waiter, as the next call in line may be
+        admissible now. Caller holds self.__condition.
+        """
+        self.__waiting.remove(ticket)
+        heapq.heapify(self.__waiting)
+        self.__condition.notify_all()
+        for loop, waiter in self.__async_waiters.values():
+            # The loop may have closed while its call was waiting
+            with suppress(RuntimeError):
+                loop.call_soon_threadsafe(_wake, waiter)
+
+    def record_usage(self, estimated_tokens: int, response: Any) -> None:
+        """
+        Charges the token bucket for the tokens a call actually used beyond its estimate.
+        """
+        usage = getattr(response, "usage_metadata", None)
+        total = getattr(usage, "total_token_count", None)
+        if isinstance(total, int) and total > estimated_tokens:
+            with self.__condition:
+                self.__tokens.take(total - estimated_tokens)
+
+    def submit(self, call: Callable[[], T], priority: int = INTERACTIVE, tokens: int = 0, key: str | None = None, deadline: float | None = None) -> T:
+        """
+        Runs a model call once admitted, retrying 429 and 5xx failures with backoff.
+
+        Args:
+            call (Callable[[], T]): Makes the model call.
+            priority (int): INTERACTIVE, BACKGROUND or BATCH.
+            tokens (int): Estimated tokens of the request.
+            key (str | None): Identifies the request. Calls with the same key in flight at the same time share one result.
+            deadline (float | None): time.monotonic() after which to stop waiting or retrying.
+        """
+        leader, future = self.__join(key)
+        if not leader:
+            COALESCED.inc()
+            return future.result(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        try:
+            for attempt in itertools.count():
+                self.admit(priority, tokens, deadline)
+                try:
+                    result = call()
+                    break
+                except Exception as error:
+                    self.__backoff(error, attempt, deadline)
+                    time.sleep(self.__backoff_seconds(attempt))
+            self.record_usage(tokens, result)
+            self.__finish(key, future, result=result)
+            return result
+        except BaseException as error:
+            self.__finish(key, future, error=error)
+            raise
+
+    async def submit_async(self, call: Callable[[], Awaitable[T]], priority: int = INTERACTIVE, tokens: int = 0, key: str | None = None, deadline: float | None = None) -> T:
+        """
+        Async counterpart of submit. Waiting for admission happens on the event loop.
+        """
+        leader, future = self.__join(key)
+        if not leader:
+            COALESCED.inc()
+            return await asyncio.wait_for(asyncio.wrap_future(future), None if deadline is None else max(0.0, deadline - time.monotonic()))
+        try:
+            for attempt in itertools.count():
+                await self.admit_async(priority, tokens, deadline)
+                try:
+                    result = await call()
+                    break
+                except Exception as error:
+                    self.__backoff(error, attempt, deadline)
+                    await asyncio.sleep(self.__backoff_seconds(attempt))
+            self.record_usage(tokens, result)
+            self.__finish(key, future, result=result)
+            return result
+        except BaseException as error:
+            self.__finish(key, future, error=error)
+            raise
+
+    def __join(self, key: str | None) -> tuple[bool, Future]:
+        """
+        Returns whether this call makes the request, and the future the result is shared through.
+        """
+        with self.__in_flight_lock:
+            if key is not None and key in self.__in_flight:
+                return False, self.__in_flight[key]
+            future: Future = Future()
+            if key is not None:
+                self.__in_flight[key] = future
+            return True, future
+
+    def __finish(self, key: str | None, future: Future, result: Any = None, error: BaseException | None = None) -> None:
+        with self.__in_flight_lock:
+            if key is not None and self.__in_flight.get(key) is future:
+                del self.__in_flight[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def __backoff(self, error: Exception, attempt: int, deadline: float | None) -> None:
+        """
+        Re-raises error unless it is retryable and a retry fits before the deadline.
+        """
+        code = _status_code(error)
+        if code not in RETRY_STATUS_CODES or attempt >= self.__max_retries:
+            raise error
+        if deadline is not None and time.monotonic() + self.__backoff_seconds(attempt) / 2 >= deadline:
+            raise error
+        if code == 429:
+            with self.__condition:
+                self.__requests.drain()
+        RETRIES.inc(code=str(code))
+
+    @staticmethod
+    def __backoff_seconds(attempt: int) -> float:
+        # Jitter spreads out the retries of calls that failed together
+        return random.uniform(0.5, 1.0) * min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt)
@@ -0,0 +1,99 @@
+from __future__ import annotations
+import itertools
+import os
+import sqlite3
+import threading
+import weakref
+from typing import Callable
+
+"""
+# ID allocator
+Hands out unique integer IDs across threads and worker processes.
+
+Each process reserves a block of IDs at a time from a small SQLite table, in a transaction
+that holds the database's write lock, so two processes never get overlapping blocks.
+Within a block, IDs come from an itertools.count, whose next() is atomic, so the common path
+takes no lock and touches no file.
+IDs are unique and increasing within a process but not contiguous; the unused rest of a block
+is skipped when a process exits.
+"""
+
+ID_STORE_FILE = "API/Ids.sqlite3"
+BLOCK_SIZE = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS id_blocks (
+    name TEXT PRIMARY KEY,
+    next_id INTEGER NOT NULL
+);
+"""
+
+class IdAllocator:
+    """
+    Block-reserving allocator for one ID sequence.
+
+    Args:
+        name (str): Sequence name, one row in the store.
+        path (str): SQLite file shared by every process.
+        block_size (int): IDs reserved per transaction.
+        floor (Callable[[], int] | None): Returns the lowest ID that may be handed out, checked
+            at each reservation, for sequences whose IDs also come from elsewhere such as a catalog file.
+    """
+    __allocators: weakref.WeakSet[IdAllocator] = weakref.WeakSet()
+
+    def __init__(self, name: str, path: str = ID_STORE_FILE, block_size: int = BLOCK_SIZE, floor: Callable[[], int] | None = None) -> None:
+        self.__name = name
+        self.__path = path
+        self.__block_size = block_size
+        self.__floor = floor
+        self.__lock = threading.Lock()
+        # (counter, end): the current block is every ID the counter yields below end
+        self.__block: tuple[itertools.count, int] = (itertools.count(), 0)
+        IdAllocator.__allocators.add(self)
+
+    def next_id(self) -> int:
+        """
+        Returns an ID no other thread or process has been given.
+        """
+        while True:
+            block = self.__block
+            counter, end = block
+            value = next(counter)
+            if value < end:
+                return value
+            with self.__lock:
+                # Another thread may have reserved a new block while this one waited
+                if self.__block is block:
+                    self.__block = self.__reserve()
+
+    def __reserve(self) -> tuple[itertools.count, int]:
+        floor = self.__floor() if self.__floor is not None else 1
+        connection = sqlite3.connect(self.__path, timeout=30, isolation_level=None)
+        try:
+            connection.executescript(_SCHEMA)
+            # IMMEDIATE takes the write lock before reading, so concurrent reservations serialize
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT next_id FROM id_blocks WHERE name = ?", (self.__name,)).fetchone()
+            start = max(floor, row[0] if row else 1)
+            connection.execute(
+                "INSERT OR REPLACE INTO id_blocks (name, next_id) VALUES (?, ?)",
+                (self.__name, start + self.__block_size),
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+        return itertools.count(start), start + self.__block_size
+
+    @classmethod
+    def _after_fork(cls) -> None:
+        # A forked worker inherits its parent's block, which the parent keeps using
+        for allocator in list(cls.__allocators):
+            allocator.__lock = threading.Lock()
+            allocator.__block = (itertools.count(), 0)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=IdAllocator._after_fork)
@@ -1,63 +1,264 @@
 from __future__ import annotations
+import csv
+import heapq
+import math
+import os
+import re
+import sys
+import threading
+from bisect import bisect_right
+from itertools import islice
+from typing import Collection, Container, Iterator, TYPE_CHECKING
+import Metrics
+from Id_Allocator import IdAllocator
+
+if TYPE_CHECKING:
+    from Job_Catalog import JobCatalog
 
 """
 # Represents a job listing
-## Do not use commas in any text feilds
-title, company, salary, description
+id, title, company, salary, location, description
+Fields containing commas or quotes are quoted CSV style. Older catalogs wrote descriptions
+unquoted, so any fields past the sixth are joined back into the description.
 """
 
+JOBS_FILE = "API/Jobs.csv"
+JOB_FIELDS = ("id", "title", "company", "salary", "location", "description")
+CATALOG_DIR = "API/Jobs.catalog"
+QUERY_PAGE_SIZE = 10
+# New job IDs continue after the highest ID in the catalog, in every process
+JOB_IDS = IdAllocator("job", floor=lambda: Job.job_source().max_id() + 1)
+# Cursors are the rank of the last job on a page: salary distance (or negated salary) and job ID
+_cursor_pattern = re.compile(r"-?\d+:\d+")
+
+def _parse_int(name: str, value: str) -> int:
+    try:
+        number = float(value) if "." in value or "e" in value.lower() else int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a whole number, got {value!r}") from None
+    # Exponents past the float range give inf, which int() can't convert
+    if not math.isfinite(number) or number != int(number) or number < 0:
+        raise ValueError(f"{name} must be a non-negative whole number, got {value!r}")
+    return int(number)
+
+def _quote(field: str) -> str:
+    if "," in field or '"' in field or field[:1] == " ":
+        return '"' + field.replace('"', '""') + '"'
+    return field
+
 class Job:
-    __job_count = 0
+    # Catalogs hold up to millions of jobs, slots keep each one free of an instance dict
+    __slots__ = ("__id", "__title", "__company", "__salary", "__location", "__description")
+
+    @staticmethod
+    def rows_from_file(path: str = JOBS_FILE) -> Iterator[tuple[int, str, str, int, str, str]]:
+        """
+        Streams (id, title, company, salary, location, description) tuples from a catalog CSV.
+        A header row is skipped.
+
+        Raises:
+            ValueError: If a row is malformed, naming its line.
+        """
+        with open(path, "r", newline="") as f:
+            reader = csv.reader(f, skipinitialspace=True)
+            for fields in reader:
+                if not fields or fields == [""] or fields[0] == JOB_FIELDS[0]:
+                    continue
+                try:
+                    row = Job.parse_row(fields)
+                except ValueError as error:
+                    raise ValueError(f"{path} line {reader.line_num}: {error}") from None
+                yield row
+
+    @staticmethod
+    def parse_row(fields: list[str]) -> tuple[int, str, str, int, str, str]:
+        """
+        Validates the raw fields of one row and converts them to a row tuple.
+
+        Raises:
+            ValueError: If a field is missing or invalid.
+        """
+        if len(fields) < 5:
+            raise ValueError(f"expected {len(JOB_FIELDS)} fields, got {len(fields)}")
+        # Rows are one line each, and the model sees them one per line
+        id, title, company, salary, location, *description = (" ".join(field.split()) for field in fields)
+        job_id = _parse_int("id", id)
+        if job_id == 0:
+            raise ValueError("id must be positive")
+        if not title or not company or not location:
+            raise ValueError("title, company and location are required")
+        return (job_id, title, company, _parse_int("salary", salary), location, ", ".join(description))
+
+    @staticmethod
+    def format_row(row: tuple[int, str, str, int, str, str]) -> str:
+        """
+        Formats a row tuple as one catalog line, quoting fields that need it.
+        """
+        return ", ".join(_quote(str(field)) for field in row) + "\n"
+
     # Works like a lot like a Java static method, but respects inheritence
-    # Very boldly assuemes there are no commas in titles or descriptions
     @classmethod
-    def jobs_from_file(cls) -> list['Job']:
-        with open("API/Jobs.csv", "r") as f:
-            lines = f.readlines()
-        f.close()
-        Job.__job_count = len(lines)
-
+    def jobs_from_file(cls, path: str = JOBS_FILE) -> list['Job']:
         # cls() is the constructor for the job class
         jobs = []
-        for job_string in lines:
-            # assumes correct formatting
-            job_attributes = job_string.split(", ")
+        for id, title, company, salary, location, description in cls.rows_from_file(path):
             jobs.append(
             cls(
-                title = str(job_attributes[1]),
-                company = str(job_attributes[2]),
-                salary = int(job_attributes[3]),
-                location = str(job_attributes[4]),
-                description = str(job_attributes[5]),
+                title = title,
+                company = company,
+                salary = salary,
+                location = location,
+                description = description,
+                id = id,
                 )
             )
         return jobs
 
     @classmethod
-    def query_jobs(cls, minimum_salary: int, location: str) -> str:
-        all_jobs = cls.jobs_from_file()
+    def job_source(cls) -> JobStore | JobCatalog:
+        """
+        Returns the columnar catalog when one has been built from the current CSV,
+        otherwise the in-memory JobStore.
+        """
+        if os.path.isdir(CATALOG_DIR):
+            from Job_Catalog import JobCatalog
+            catalog = JobCatalog.default()
+            if catalog.is_current():
+                return catalog
+        return JobStore.default()
+
+    @classmethod
+    def iter_jobs(cls, minimum_salary: int, location: str) -> Iterator['Job']:
+        """
+        Streams the jobs in location paying more than minimum_salary.
+        """
+        return cls.job_source().iter_query(minimum_salary, location)
+
+    @classmethod
+    def query_jobs(cls, minimum_salary: int, location: str, ideal_salary: int | None = None, cursor: str | None = None, limit: int = QUERY_PAGE_SIZE, exclude: Container[int] | None = None) -> str:
+        """
+        Returns one page of matching jobs as a string for the model.
+
+        Args:
+            minimum_salary (int): Jobs must pay more than this.
+            location (str): Exact location to match.
+            ideal_salary (int | None): Salary the ranking is centred on.
+            cursor (str | None): Cursor returned by the previous page.
+            limit (int): Maximum number of jobs per page.
+            exclude (Container[int] | None): IDs of jobs to leave out, such as those the candidate has already seen.
+        """
+        return cls.format_page(*cls.query_page(minimum_salary, location, ideal_salary, cursor, limit, exclude))
+
+    @classmethod
+    def query_page(cls, minimum_salary: int, location: str, ideal_salary: int | None = None, cursor: str | None = None, limit: int = QUERY_PAGE_SIZE, exclude: Container[int] | None = None) -> tuple[list[Job], str | None, int]:
+        """
+        Finds one page of matching jobs.
+
+        Matches are streamed and only the best limit + 1 are kept in a heap, ranked by
+        distance from ideal_salary (or highest salary first when it is not given).
+        Excluded jobs are skipped after the cursor, so they never shift a page boundary.
+
+        Returns:
+            tuple[list[Job], str | None, int]: The page, the cursor for the next page if more jobs
+                match, and how many matching jobs past the cursor were excluded.
+        """
+        if ideal_salary is None:
+            rank = lambda job: (-job.get_salary(), job.get_id())
+        else:
+            rank = lambda job: (abs(job.get_salary() - ideal_salary), job.get_id())
+
+        scanned = 0
+        excluded = 0
+        def count_scanned(jobs: Iterator[Job]) -> Iterator[Job]:
+            nonlocal scanned
+            for job in jobs:
+                scanned += 1
+                yield job
+
+        def skip_excluded(jobs: Iterator[Job]) -> Iterator[Job]:
+            nonlocal excluded
+            for job in jobs:
+                if job.get_id() in exclude:
+                    excluded += 1
+                else:
+                    yield job
+
+        matches = count_scanned(cls.iter_jobs(minimum_salary, location))
+        if cursor:
+            if not _cursor_pattern.fullmatch(cursor.strip()):
+                raise ValueError(f"Invalid cursor {cursor!r}. Use the cursor exactly as given with the previous page, or leave it out to start again from the first page.")
+            last_rank = tuple(int(part) for part in cursor.strip().split(":"))
+            matches = (job for job in matches if rank(job) > last_rank)
+        if exclude:
+            matches = skip_excluded(matches)
+
+        page = heapq.nsmallest(limit + 1, matches, key=rank)
+        next_cursor = ":".join(str(part) for part in rank(page[limit - 1])) if len(page) > limit else None
+        Metrics.record_job_query("query_jobs", scanned, len(page[:limit]))
+        return page[:limit], next_cursor, excluded
+
+    @staticmethod
+    def format_page(jobs: list[Job], next_cursor: str | None = None, excluded: int = 0) -> str:
+        """
+        Formats a page of jobs for the model, noting how many jobs were excluded and the next page's cursor.
+        """
         matched_jobs = ""
-        for job in all_jobs:
-            if job.get_salary() > minimum_salary and job.get_location() == location:
-                matched_jobs += f"{str(job)}\n"
+        for job in jobs:
+            matched_jobs += f"{str(job)}\n"
+        if excluded:
+            matched_jobs += f"{excluded} matching jobs the candidate has already seen, shortlisted or rejected were left out.\n"
+        if next_cursor is not None:
+            matched_jobs += f"More jobs match. Call query_jobs again with cursor \"{next_cursor}\" for the next page.\n"
         return matched_jobs
 
+    @classmethod
+    def semantic_query_jobs(cls, description: str, limit: int = QUERY_PAGE_SIZE, exclude: Collection[int] | None = None) -> str:
+        """
+        Returns the jobs whose descriptions are most similar to the given description.
+
+        Args:
+            description (str): Free text describing the job, culture and responsibilities wanted.
+            limit (int): Maximum number of jobs to return.
+            exclude (Collection[int] | None): IDs of jobs to leave out.
+        """
+        return cls.format_page(*cls.semantic_query_page(description, limit, exclude))
+
+    @classmethod
+    def semantic_query_page(cls, description: str, limit: int = QUERY_PAGE_SIZE, exclude: Collection[int] | None = None) -> tuple[list[Job], None, int]:
+        """
+        Finds the jobs most similar to description, in the same shape as query_page.
+        Enough extra matches are scored that excluded jobs never shorten the page.
+        """
+        from Job_Search import JobIndex
+        source = cls.job_source()
+        index = JobIndex.default()
+        jobs: list[Job] = []
+        excluded = 0
+        for job_id, score in index.query(description, limit + (len(exclude) if exclude else 0)):
+            if exclude and job_id in exclude:
+                excluded += 1
+                continue
+            job = source.get(job_id)
+            if job is not None:
+                jobs.append(job)
+                if len(jobs) == limit:
+                    break
+        # Every indexed job is scored
+        Metrics.record_job_query("semantic_query_jobs", len(index), len(jobs))
+        return jobs, None, excluded
 
-    def __init__(self, title: str, company: str, salary: int, location: str, description: str | None = None, id: int | None = None,) -> None:
-        if id == None:
-            with open("API/Jobs.csv", "r") as f:
-                lines = f.readlines()
-            f.close()
-            Job.__job_count = len(lines) + 1
 
-            self.__id = Job.__job_count
+    def __init__(self, title: str, company: str, salary: int, location: str, description: str | None = None, id: int | None = None,) -> None:
+        if id is None:
+            self.__id = JOB_IDS.next_id()
         else:
-            self._id = id
+            self.__id = id
         
         self.__title = title
-        self.__company = company
+        # Shared by many jobs, so every job references one copy
+        self.__company = sys.intern(company)
         self.__salary = salary
-        self.__location = location
+        self.__location = sys.intern(location) if location is not None else None
         self.__description = description
 
     def set_salary(self, new_salary: int):
@@ -66,9 +267,23 @@ class Job:
     def update_description(self, new_description: str):
         self.__description = new_description
 
-    def save(self):
-        with open("Jobs.csv", "a") as f:
-            f.write(f"{self.__id}, {self.__title}, {self.__company}, {self.__salary}, {self.__location}, {self.__description}\n")
+    def save(self) -> None:
+        """
+        Appends the job to the catalog and the in-memory store, unless its ID is already listed.
+        """
+        JobStore.default().append([self])
+
+    def to_row(self) -> tuple[int, str, str, int, str, str]:
+        return (self.__id, self.__title, self.__company, self.__salary, str(self.__location), self.__description or "")
+
+    def get_id(self) -> int:
+        return self.__id
+
+    def get_title(self) -> str:
+        return self.__title
+
+    def get_company(self) -> str:
+        return self.__company
     
     def get_salary(self) -> int:
         return self.__salary
@@ -76,6 +291,143 @@ class Job:
     def get_location(self) -> str | None:
         return self.__location
 
+    def get_description(self) -> str | None:
+        return self.__description
+
     def __str__(self):
         return f"Job (No. {self.__id}): {self.__title} at {self.__company} in {self.__location}, Salary: {self.__salary}, , Description: {self.__description}"
 
+class JobStore:
+    """
+    Loaded-once, in-memory index of the job catalog.
+
+    Jobs are grouped by location and each group is kept sorted by salary, so a
+    minimum salary + location query is a dict lookup followed by a bisect.
+    The backing file is only re-parsed when its mtime changes.
+
+    Args:
+        path (str): Path to the job catalog CSV.
+    """
+    __default: JobStore | None = None
+    __default_lock = threading.Lock()
+
+    def __init__(self, path: str = JOBS_FILE) -> None:
+        self.__path = path
+        self.__lock = threading.Lock()
+        self.__mtime: int | None = None
+        self.__jobs: list[Job] = []
+        # location -> (ascending salaries, jobs in the same order)
+        self.__by_location: dict[str, tuple[list[int], list[Job]]] = {}
+        self.__by_id: dict[int, Job] = {}
+        self.__max_id = 0
+
+    @classmethod
+    def default(cls) -> JobStore:
+        """
+        Returns the process-wide store for JOBS_FILE, creating it on first use.
+        """
+        if cls.__default is None:
+            with cls.__default_lock:
+                if cls.__default is None:
+                    cls.__default = cls()
+        return cls.__default
+
+    def refresh(self) -> None:
+        """
+        Re-reads the catalog if the file changed since it was last loaded.
+        """
+        mtime = os.stat(self.__path).st_mtime_ns
+        if mtime == self.__mtime:
+            return
+        with self.__lock:
+            if mtime == self.__mtime:
+                return
+            jobs = Job.jobs_from_file(self.__path)
+            by_location: dict[str, tuple[list[int], list[Job]]] = {}
+            for job in sorted(jobs, key=lambda job: job.get_salary()):
+                salaries, located_jobs = by_location.setdefault(str(job.get_location()), ([], []))
+                salaries.append(job.get_salary())
+                located_jobs.append(job)
+            self.__jobs = jobs
+            self.__by_location = by_location
+            self.__by_id = {job.get_id(): job for job in jobs}
+            self.__max_id = max([self.__max_id] + [job.get_id() for job in jobs])
+            self.__mtime = mtime
+
+    def jobs(self) -> list[Job]:
+        """
+        Returns every job in the catalog, in file order.
+        """
+        self.refresh()
+        return self.__jobs
+
+    def get(self, job_id: int) -> Job | None:
+        """
+        Returns the job with the given ID, or None.
+        """
+        self.refresh()
+        return self.__by_id.get(job_id)
+
+    def iter_query(self, minimum_salary: int, location: str) -> Iterator[Job]:
+        """
+        Streams the jobs in location paying more than minimum_salary, lowest salary first.
+        """
+        self.refresh()
+        salaries, located_jobs = self.__by_location.get(location, ([], []))
+        return islice(located_jobs, bisect_right(salaries, minimum_salary), None)
+
+    def query(self, minimum_salary: int, location: str) -> list[Job]:
+        """
+        Returns the jobs in location paying more than minimum_salary, lowest salary first.
+        """
+        return list(self.iter_query(minimum_salary, location))
+
+    def append(self, jobs: list[Job]) -> list[Job]:
+        """
+        Appends new jobs to the catalog file and adds them to the in-memory indexes in place,
+        so the next query doesn't re-read the file.
+        Jobs whose ID is already in the catalog are skipped.
+
+        Raises:
+            ValueError: If a job is invalid. Nothing is written.
+
+        Returns:
+            list[Job]: The jobs that were appended.
+        """
+        self.refresh()
+        with self.__lock:
+            added: dict[int, Job] = {}
+            for job in jobs:
+                Job.parse_row([str(field) for field in job.to_row()])
+                if job.get_id() not in self.__by_id:
+                    added[job.get_id()] = job
+            if not added:
+                return []
+
+            # One write call, so concurrent appenders never interleave within a line
+            with open(self.__path, "a", newline="") as f:
+                f.write("".join(Job.format_row(job.to_row()) for job in added.values()))
+            self.__mtime = os.stat(self.__path).st_mtime_ns
+
+            by_location: dict[str, list[Job]] = {}
+            for job in added.values():
+                self.__jobs.append(job)
+                self.__by_id[job.get_id()] = job
+                self.__max_id = max(self.__max_id, job.get_id())
+                by_location.setdefault(str(job.get_location()), []).append(job)
+            for location, located_new in by_location.items():
+                # Copy the group so queries iterating the old one are unaffected
+                salaries, located_jobs = (list(group) for group in self.__by_location.get(location, ([], [])))
+                for job in located_new:
+                    index = bisect_right(salaries, job.get_salary())
+                    salaries.insert(index, job.get_salary())
+                    located_jobs.insert(index, job)
+                self.__by_location[location] = (salaries, located_jobs)
+            return list(added.values())
+
+    def max_id(self) -> int:
+        """
+        Returns the highest job ID in the catalog.
+        """
+        self.refresh()
+        return self.__max_id
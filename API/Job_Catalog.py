@@ -0,0 +1,282 @@
+from __future__ import annotations
+import json
+import mmap
+import os
+import shutil
+import sys
+import threading
+from typing import Iterator
+import numpy as np
+from Job import Job, JOBS_FILE, CATALOG_DIR
+
+"""
+# Columnar job catalog
+A directory that workers memory-map instead of parsing Jobs.csv into Job objects.
+
+id.npy, salary.npy              int64, one entry per row
+company.npy, location.npy       int32 codes into the dictionaries in meta.json
+text_offsets.npy                int64, 2 * rows + 1 offsets into text.bin
+text.bin                        utf-8 title and description of every row, back to back
+meta.json                       dictionaries, row count and the mtime of the source CSV
+
+Row r's title is text.bin[offsets[2r]:offsets[2r + 1]] and its description
+is text.bin[offsets[2r + 1]:offsets[2r + 2]].
+JobCatalog.append adds new jobs to the CSV and the catalog together, so the catalog stays
+current without re-reading the CSV.
+Build with: python API/Job_Catalog.py [csv_path] [catalog_dir]
+"""
+
+def convert_csv(csv_path: str = JOBS_FILE, catalog_dir: str = CATALOG_DIR) -> int:
+    """
+    Converts a job CSV into a columnar catalog directory.
+
+    The catalog is written next to catalog_dir and swapped into place once complete,
+    so readers never see a half-written catalog.
+
+    Args:
+        csv_path (str): Source CSV in the Jobs.csv format.
+        catalog_dir (str): Destination catalog directory.
+
+    Returns:
+        int: Number of rows written.
+    """
+    source_mtime = os.stat(csv_path).st_mtime_ns
+    building_dir = catalog_dir + ".building"
+    shutil.rmtree(building_dir, ignore_errors=True)
+    os.makedirs(building_dir)
+
+    ids: list[int] = []
+    salaries: list[int] = []
+    company_codes: list[int] = []
+    location_codes: list[int] = []
+    companies: dict[str, int] = {}
+    locations: dict[str, int] = {}
+    offsets = [0]
+
+    with open(os.path.join(building_dir, "text.bin"), "wb") as text_file:
+        for id, title, company, salary, location, description in Job.rows_from_file(csv_path):
+            ids.append(id)
+            salaries.append(salary)
+            company_codes.append(companies.setdefault(company, len(companies)))
+            location_codes.append(locations.setdefault(location, len(locations)))
+            for field in (title, description):
+                encoded = field.encode("utf-8")
+                text_file.write(encoded)
+                offsets.append(offsets[-1] + len(encoded))
+
+    _write_columns(building_dir, ids, salaries, company_codes, location_codes, offsets)
+    _write_meta(building_dir, len(ids), source_mtime, list(companies), list(locations))
+    _swap(building_dir, catalog_dir)
+    return len(ids)
+
+def _write_columns(building_dir: str, ids, salaries, company_codes, location_codes, offsets) -> None:
+    np.save(os.path.join(building_dir, "id.npy"), np.asarray(ids, dtype=np.int64))
+    np.save(os.path.join(building_dir, "salary.npy"), np.asarray(salaries, dtype=np.int64))
+    np.save(os.path.join(building_dir, "company.npy"), np.asarray(company_codes, dtype=np.int32))
+    np.save(os.path.join(building_dir, "location.npy"), np.asarray(location_codes, dtype=np.int32))
+    np.save(os.path.join(building_dir, "text_offsets.npy"), np.asarray(offsets, dtype=np.int64))
+
+def _write_meta(building_dir: str, rows: int, source_mtime: int, companies: list[str], locations: list[str]) -> None:
+    with open(os.path.join(building_dir, "meta.json"), "w") as meta_file:
+        json.dump({
+            "rows": rows,
+            "source_mtime_ns": source_mtime,
+            "companies": companies,
+            "locations": locations,
+        }, meta_file)
+
+def _swap(building_dir: str, catalog_dir: str) -> None:
+    """
+    Swaps a finished catalog into place.
+    """
+    retired_dir = catalog_dir + ".old"
+    shutil.rmtree(retired_dir, ignore_errors=True)
+    if os.path.isdir(catalog_dir):
+        os.rename(catalog_dir, retired_dir)
+    os.rename(building_dir, catalog_dir)
+    shutil.rmtree(retired_dir, ignore_errors=True)
+
+class JobCatalog:
+    """
+    Memory-mapped view of a columnar job catalog. It is never modified in place: append
+    writes a new catalog and swaps it in.
+
+    Columns are mapped rather than read, so every worker process shares the same
+    pages through the OS page cache. Queries filter over the columns and only build
+    Job objects for the rows that match.
+
+    Args:
+        catalog_dir (str): Directory written by convert_csv.
+        csv_path (str): Source CSV, used to detect a stale catalog.
+    """
+    __default: JobCatalog | None = None
+    __default_lock = threading.Lock()
+
+    def __init__(self, catalog_dir: str = CATALOG_DIR, csv_path: str = JOBS_FILE) -> None:
+        self.__catalog_dir = catalog_dir
+        self.__csv_path = csv_path
+        self.__meta_mtime = os.stat(self.__path("meta.json")).st_mtime_ns
+
+        with open(self.__path("meta.json")) as meta_file:
+            meta = json.load(meta_file)
+        self.__rows: int = meta["rows"]
+        self.__source_mtime: int = meta["source_mtime_ns"]
+        self.__companies: list[str] = meta["companies"]
+        self.__locations: list[str] = meta["locations"]
+        self.__location_codes = {location: code for code, location in enumerate(self.__locations)}
+
+        self.__ids = np.load(self.__path("id.npy"), mmap_mode="r")
+        self.__salaries = np.load(self.__path("salary.npy"), mmap_mode="r")
+        self.__company = np.load(self.__path("company.npy"), mmap_mode="r")
+        self.__location = np.load(self.__path("location.npy"), mmap_mode="r")
+        self.__text_offsets = np.load(self.__path("text_offsets.npy"), mmap_mode="r")
+
+        # Built on first lookup by ID
+        self.__id_order: np.ndarray | None = None
+
+        # mmap refuses empty files
+        if os.path.getsize(self.__path("text.bin")) > 0:
+            with open(self.__path("text.bin"), "rb") as text_file:
+                self.__text: mmap.mmap | bytes = mmap.mmap(text_file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.__text = b""
+
+    @classmethod
+    def default(cls) -> JobCatalog:
+        """
+        Returns the process-wide catalog for CATALOG_DIR, reopening it if it was rebuilt.
+        """
+        with cls.__default_lock:
+            meta_mtime = os.stat(os.path.join(CATALOG_DIR, "meta.json")).st_mtime_ns
+            if cls.__default is None or cls.__default.__meta_mtime != meta_mtime:
+                cls.__default = cls()
+            return cls.__default
+
+    def __path(self, name: str) -> str:
+        return os.path.join(self.__catalog_dir, name)
+
+    def __len__(self) -> int:
+        return self.__rows
+
+    def is_current(self) -> bool:
+        """
+        Returns False if the source CSV changed after the catalog was built.
+        """
+        return os.stat(self.__csv_path).st_mtime_ns == self.__source_mtime
+
+    def append(self, rows: list[tuple[int, str, str, int, str, str]]) -> int:
+        """
+        Appends validated rows (see Job.parse_row) whose IDs are not in the catalog yet, to both
+        the source CSV and a copy of the catalog. The copy is built first and swapped in right
+        after the CSV is appended, recording the CSV's new mtime, so the catalog stays current.
+        Processes reopen it on their next JobCatalog.default().
+
+        Returns:
+            int: Number of rows appended.
+        """
+        new_ids = np.asarray([row[0] for row in rows], dtype=np.int64)
+        rows = [row for row, listed in zip(rows, np.isin(new_ids, self.__ids)) if not listed]
+        if not rows:
+            return 0
+
+        building_dir = self.__catalog_dir + ".building"
+        shutil.rmtree(building_dir, ignore_errors=True)
+        os.makedirs(building_dir)
+        companies = {company: code for code, company in enumerate(self.__companies)}
+        locations = dict(self.__location_codes)
+        offsets = [int(self.__text_offsets[-1])]
+        shutil.copyfile(self.__path("text.bin"), os.path.join(building_dir, "text.bin"))
+        with open(os.path.join(building_dir, "text.bin"), "ab") as text_file:
+            for row in rows:
+                for field in (row[1], row[5]):
+                    encoded = field.encode("utf-8")
+                    text_file.write(encoded)
+                    offsets.append(offsets[-1] + len(encoded))
+        _write_columns(
+            building_dir,
+            np.concatenate([self.__ids, [row[0] for row in rows]]),
+            np.concatenate([self.__salaries, [row[3] for row in rows]]),
+            np.concatenate([self.__company, [companies.setdefault(row[2], len(companies)) for row in rows]]),
+            np.concatenate([self.__location, [locations.setdefault(row[4], len(locations)) for row in rows]]),
+            np.concatenate([self.__text_offsets, offsets[1:]]),
+        )
+
+        # One write call, so concurrent appenders never interleave within a line
+        with open(self.__csv_path, "a", newline="") as csv_file:
+            csv_file.write("".join(Job.format_row(row) for row in rows))
+        _write_meta(building_dir, self.__rows + len(rows), os.stat(self.__csv_path).st_mtime_ns, list(companies), list(locations))
+        _swap(building_dir, self.__catalog_dir)
+        return len(rows)
+
+    def job(self, row: int) -> Job:
+        """
+        Builds the Job object for a single catalog row.
+        """
+        offsets = self.__text_offsets[2 * row: 2 * row + 3]
+        return Job(
+            title = self.__text[offsets[0]:offsets[1]].decode("utf-8"),
+            company = self.__companies[self.__company[row]],
+            salary = int(self.__salaries[row]),
+            location = self.__locations[self.__location[row]],
+            description = self.__text[offsets[1]:offsets[2]].decode("utf-8"),
+            id = int(self.__ids[row]),
+        )
+
+    def get(self, job_id: int) -> Job | None:
+        """
+        Returns the job with the given ID, or None. Binary searches an ID-sorted permutation.
+        """
+        if self.__id_order is None:
+            self.__id_order = np.argsort(self.__ids, kind="stable")
+        position = int(np.searchsorted(self.__ids, job_id, sorter=self.__id_order))
+        if position < self.__rows and self.__ids[self.__id_order[position]] == job_id:
+            return self.job(int(self.__id_order[position]))
+        return None
+
+    def max_id(self) -> int:
+        """
+        Returns the highest job ID in the catalog, 0 if it is empty.
+        """
+        return int(self.__ids.max()) if self.__rows else 0
+
+    def columns(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, list[str]]:
+        """
+        Returns the ID, salary and location code columns and the location of each code, without copying.
+        """
+        return self.__ids, self.__salaries, self.__location, self.__locations
+
+    def text(self, row: int) -> str:
+        """
+        Returns a row's title and description.
+        """
+        offsets = self.__text_offsets[2 * row: 2 * row + 3]
+        return f"{self.__text[offsets[0]:offsets[1]].decode('utf-8')} {self.__text[offsets[1]:offsets[2]].decode('utf-8')}"
+
+    def jobs(self) -> list[Job]:
+        """
+        Returns every job in the catalog, in file order. Materializes every row.
+        """
+        return [self.job(row) for row in range(self.__rows)]
+
+    def iter_query(self, minimum_salary: int, location: str) -> Iterator[Job]:
+        """
+        Streams the jobs in location paying more than minimum_salary, lowest salary first.
+        """
+        code = self.__location_codes.get(location)
+        if code is None:
+            return
+        rows = np.flatnonzero((self.__location == code) & (self.__salaries > minimum_salary))
+        rows = rows[np.argsort(self.__salaries[rows], kind="stable")]
+        for row in rows:
+            yield self.job(int(row))
+
+    def query(self, minimum_salary: int, location: str) -> list[Job]:
+        """
+        Returns the jobs in location paying more than minimum_salary, lowest salary first.
+        """
+        return list(self.iter_query(minimum_salary, location))
+
+if __name__ == "__main__":
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else JOBS_FILE
+    catalog_dir = sys.argv[2] if len(sys.argv) > 2 else CATALOG_DIR
+    print(f"Wrote {convert_csv(csv_path, catalog_dir)} jobs to {catalog_dir}")
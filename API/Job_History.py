@@ -0,0 +1,190 @@
+from __future__ import annotations
+import threading
+from typing import Callable, Iterable, Iterator, List, Optional
+from Job import Job, QUERY_PAGE_SIZE
+
+"""
+# Job history
+The jobs one candidate's agent has already shown, shortlisted, rejected or recorded an offer for.
+
+Job queries go through the history, which leaves out every job the candidate has already
+seen, so each listing costs tokens once per session. Seen job IDs are kept in a sparse
+bitset of 64-bit words, a few dozen bytes per word in use however large the catalog.
+
+The session store saves the history with the session (see state and from_state).
+"""
+
+class JobIdSet:
+    """
+    Sparse bitset of job IDs. Word i holds IDs 64 * i to 64 * i + 63.
+    """
+    __slots__ = ("__words", "__count")
+
+    def __init__(self, ids: Iterable[int] = ()) -> None:
+        self.__words: dict[int, int] = {}
+        self.__count = 0
+        for id in ids:
+            self.add(id)
+
+    def add(self, id: int) -> None:
+        word = self.__words.get(id >> 6, 0)
+        bit = 1 << (id & 63)
+        if not word & bit:
+            self.__words[id >> 6] = word | bit
+            self.__count += 1
+
+    def __contains__(self, id: object) -> bool:
+        if not isinstance(id, int):
+            return False
+        return bool(self.__words.get(id >> 6, 0) >> (id & 63) & 1)
+
+    def __len__(self) -> int:
+        return self.__count
+
+    def __iter__(self) -> Iterator[int]:
+        for index in sorted(self.__words):
+            word = self.__words[index]
+            while word:
+                low_bit = word & -word
+                yield (index << 6) + low_bit.bit_length() - 1
+                word ^= low_bit
+
+class JobHistory:
+    """
+    Seen jobs, shortlist and offers of one candidate, and the job queries that skip seen jobs.
+    Function calls from one model response run in parallel, so updates take a lock.
+
+    Attributes:
+        __seen (JobIdSet): Every job shown, shortlisted, rejected or offered.
+        __shortlist (List[int]): Shortlisted job IDs, oldest first.
+        __offers (dict[int, int | None]): Job ID -> offered salary, if known.
+    """
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        self.__seen = JobIdSet()
+        self.__shortlist: List[int] = []
+        self.__offers: dict[int, int | None] = {}
+        self.__change_listener: Optional[Callable[[JobHistory], None]] = None
+
+    def set_change_listener(self, listener: Optional[Callable[[JobHistory], None]]) -> None:
+        """
+        Registers a callback that runs with the history after every change, for example to persist it.
+        It runs on the caller's thread so it should only queue work.
+        """
+        self.__change_listener = listener
+
+    def state(self) -> dict:
+        """
+        Returns the history as JSON-serializable lists, for the session store.
+        """
+        with self.__lock:
+            return {
+                "seen": list(self.__seen),
+                "shortlist": list(self.__shortlist),
+                "offers": [[job_id, salary] for job_id, salary in self.__offers.items()],
+            }
+
+    @classmethod
+    def from_state(cls, state: dict) -> JobHistory:
+        """
+        Rebuilds a history saved with state.
+        """
+        history = cls()
+        history.__seen = JobIdSet(state.get("seen", []))
+        history.__shortlist = list(state.get("shortlist", []))
+        history.__offers = {job_id: salary for job_id, salary in state.get("offers", [])}
+        return history
+
+    def query_jobs(self, minimum_salary: int, location: str, ideal_salary: int | None = None, cursor: str | None = None) -> str:
+        """
+        Job.query_jobs without the jobs the candidate has already seen, which are marked seen once returned.
+        """
+        jobs, next_cursor, excluded = Job.query_page(minimum_salary, location, ideal_salary, cursor, QUERY_PAGE_SIZE, self.__seen)
+        self.__mark_seen(job.get_id() for job in jobs)
+        self.__changed()
+        return Job.format_page(jobs, next_cursor, excluded)
+
+    def semantic_query_jobs(self, description: str) -> str:
+        """
+        Job.semantic_query_jobs without the jobs the candidate has already seen.
+        """
+        jobs, next_cursor, excluded = Job.semantic_query_page(description, QUERY_PAGE_SIZE, self.__seen)
+        self.__mark_seen(job.get_id() for job in jobs)
+        self.__changed()
+        return Job.format_page(jobs, next_cursor, excluded)
+
+    def shortlist_job(self, job_id: int) -> str:
+        self.__check_listed(job_id)
+        self.__shortlist_job(job_id)
+        self.__changed()
+        return f"Job {job_id} is on the shortlist."
+
+    def reject_job(self, job_id: int) -> str:
+        self.__check_listed(job_id)
+        self.__reject_job(job_id)
+        self.__changed()
+        return f"Job {job_id} won't be shown again."
+
+    def record_offer(self, job_id: int, salary: int | None = None) -> str:
+        self.__check_listed(job_id)
+        self.__record_offer(job_id, salary)
+        self.__changed()
+        return f"Offer for job {job_id} recorded."
+
+    def get_shortlist(self) -> str:
+        """
+        Returns the shortlisted and offered jobs as a string for the model.
+        """
+        source = Job.job_source()
+        with self.__lock:
+            shortlist = list(self.__shortlist)
+            offers = dict(self.__offers)
+        lines = []
+        for job_id in shortlist:
+            job = source.get(job_id)
+            lines.append(f"Shortlisted: {job if job is not None else f'Job (No. {job_id}), no longer listed'}")
+        for job_id, salary in offers.items():
+            job = source.get(job_id)
+            offer = f"Offer{f' of {salary}' if salary is not None else ''}"
+            lines.append(f"{offer}: {job if job is not None else f'Job (No. {job_id}), no longer listed'}")
+        return "\n".join(lines) if lines else "The shortlist is empty and there are no offers."
+
+    def get_seen(self) -> JobIdSet:
+        return self.__seen
+
+    def get_shortlisted_ids(self) -> List[int]:
+        return list(self.__shortlist)
+
+    def get_offers(self) -> dict[int, int | None]:
+        return dict(self.__offers)
+
+    @staticmethod
+    def __check_listed(job_id: int) -> None:
+        if Job.job_source().get(job_id) is None:
+            raise ValueError(f"There is no job No. {job_id}")
+
+    def __shortlist_job(self, job_id: int) -> None:
+        with self.__lock:
+            self.__seen.add(job_id)
+            if job_id not in self.__shortlist:
+                self.__shortlist.append(job_id)
+
+    def __reject_job(self, job_id: int) -> None:
+        with self.__lock:
+            self.__seen.add(job_id)
+            if job_id in self.__shortlist:
+                self.__shortlist.remove(job_id)
+
+    def __record_offer(self, job_id: int, salary: int | None) -> None:
+        with self.__lock:
+            self.__seen.add(job_id)
+            self.__offers[job_id] = salary
+
+    def __changed(self) -> None:
+        if self.__change_listener is not None:
+            self.__change_listener(self)
+
+    def __mark_seen(self, job_ids: Iterable[int]) -> None:
+        with self.__lock:
+            for job_id in job_ids:
+                self.__seen.add(job_id)
@@ -0,0 +1,209 @@
+from __future__ import annotations
+import csv
+import json
+import os
+import stat
+import sys
+import tempfile
+import time
+from typing import Iterator
+from Job import Job, JobStore, JOBS_FILE, JOB_FIELDS, CATALOG_DIR
+
+"""
+# Job ingestion
+Imports job feeds into the catalog CSV.
+
+Feeds are CSV with the catalog's columns and an optional header row, or JSONL with one
+object per line keyed by the catalog's column names. They are parsed in chunks, every row
+is validated, and rows are deduplicated by ID with the last occurrence winning.
+
+ingest rewrites the catalog: imported jobs replace catalog jobs with the same ID, or the
+whole catalog with replace=True. The new catalog is written to a temporary file and renamed
+over the old one, so readers see one or the other and never a partial file. Queries pick it
+up on their next refresh, and the columnar catalog is rebuilt when one is in use.
+
+append_feed adds only jobs with new IDs without rewriting the catalog. With a current columnar
+catalog, the jobs are appended to the CSV and the columnar catalog together, and the CSV is
+not parsed. Otherwise they are appended through the JobStore, which parses the CSV once to
+know which IDs are listed, and the columnar catalog, if any, is rebuilt as ingest does.
+Either way, other processes pick up the new jobs on their next query.
+
+Run with: python API/Job_Ingest.py [--replace | --append] feed.csv [feed.jsonl ...]
+"""
+
+CHUNK_ROWS = 50000
+# Invalid rows beyond this are counted but not listed
+MAX_REPORTED_ERRORS = 20
+
+def _raw_rows(path: str) -> Iterator[tuple[int, list[str] | str]]:
+    """
+    Streams (line number, raw fields) from a CSV or JSONL feed, or (line number, error) for
+    lines that can't be split into fields.
+    """
+    with open(path, "r", newline="") as feed:
+        if path.endswith((".jsonl", ".ndjson")):
+            for line_number, line in enumerate(feed, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as error:
+                    yield line_number, f"invalid JSON: {error}"
+                    continue
+                if not isinstance(record, dict):
+                    yield line_number, "not a JSON object"
+                    continue
+                yield line_number, ["" if record.get(name) is None else str(record[name]) for name in JOB_FIELDS]
+        else:
+            reader = csv.reader(feed, skipinitialspace=True)
+            for fields in reader:
+                if not fields or fields == [""] or fields[0] == JOB_FIELDS[0]:
+                    continue
+                yield reader.line_num, fields
+
+def read_feed(path: str, chunk_rows: int = CHUNK_ROWS) -> Iterator[tuple[list[tuple[int, str, str, int, str, str]], list[str]]]:
+    """
+    Streams a feed in chunks of validated rows.
+
+    Yields:
+        tuple[list, list[str]]: Up to chunk_rows valid row tuples and an error for each invalid row in the chunk.
+    """
+    rows: list[tuple[int, str, str, int, str, str]] = []
+    errors: list[str] = []
+    for line_number, fields in _raw_rows(path):
+        try:
+            if isinstance(fields, str):
+                raise ValueError(fields)
+            rows.append(Job.parse_row(fields))
+        except ValueError as error:
+            errors.append(f"{path} line {line_number}: {error}")
+        if len(rows) + len(errors) >= chunk_rows:
+            yield rows, errors
+            rows, errors = [], []
+    if rows or errors:
+        yield rows, errors
+
+def ingest(feeds: list[str], jobs_file: str = JOBS_FILE, replace: bool = False, chunk_rows: int = CHUNK_ROWS) -> dict:
+    """
+    Imports feeds into the catalog, replacing jobs with the same ID.
+
+    Args:
+        feeds (list[str]): CSV or JSONL feed paths.
+        jobs_file (str): Catalog CSV to write.
+        replace (bool): Replace the whole catalog with the feeds instead of merging them into it.
+        chunk_rows (int): Rows parsed and written per chunk.
+
+    Returns:
+        dict: Counts of rows read, invalid, duplicated within the feeds, kept from the catalog
+            and written, and the first MAX_REPORTED_ERRORS errors.
+    """
+    started = time.perf_counter()
+    stats = {"read": 0, "invalid": 0, "duplicates": 0, "kept": 0, "written": 0, "errors": []}
+    incoming: dict[int, tuple[int, str, str, int, str, str]] = {}
+    for feed in feeds:
+        for rows, errors in read_feed(feed, chunk_rows):
+            stats["read"] += len(rows) + len(errors)
+            stats["invalid"] += len(errors)
+            stats["errors"].extend(errors[:MAX_REPORTED_ERRORS - len(stats["errors"])])
+            for row in rows:
+                if row[0] in incoming:
+                    stats["duplicates"] += 1
+                incoming[row[0]] = row
+
+    directory = os.path.dirname(os.path.abspath(jobs_file))
+    descriptor, temporary_path = tempfile.mkstemp(dir=directory, prefix=".Jobs.", suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "w", newline="") as catalog:
+            if not replace and os.path.exists(jobs_file):
+                lines: list[str] = []
+                for row in Job.rows_from_file(jobs_file):
+                    if row[0] not in incoming:
+                        lines.append(Job.format_row(row))
+                        if len(lines) >= chunk_rows:
+                            catalog.writelines(lines)
+                            stats["kept"] += len(lines)
+                            lines = []
+                catalog.writelines(lines)
+                stats["kept"] += len(lines)
+            rows = list(incoming.values())
+            for start in range(0, len(rows), chunk_rows):
+                catalog.writelines(Job.format_row(row) for row in rows[start:start + chunk_rows])
+            catalog.flush()
+            os.fsync(catalog.fileno())
+        # mkstemp creates the file owner-only, keep the catalog's permissions
+        mode = stat.S_IMODE(os.stat(jobs_file).st_mode) if os.path.exists(jobs_file) else 0o644
+        os.chmod(temporary_path, mode)
+        os.replace(temporary_path, jobs_file)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.unlink(temporary_path)
+        raise
+    stats["written"] = stats["kept"] + len(incoming)
+
+    if os.path.abspath(jobs_file) == os.path.abspath(JOBS_FILE) and os.path.isdir(CATALOG_DIR):
+        from Job_Catalog import convert_csv
+        convert_csv(jobs_file, CATALOG_DIR)
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+def append_feed(feed: str, store: JobStore | None = None, chunk_rows: int = CHUNK_ROWS) -> dict:
+    """
+    Appends the jobs in a feed whose IDs are not in the catalog yet.
+
+    Args:
+        feed (str): CSV or JSONL feed path.
+        store (JobStore | None): Store to append to instead of the process-wide catalog.
+        chunk_rows (int): Rows parsed and appended per chunk.
+
+    Returns:
+        dict: Counts of rows read, invalid, appended and skipped as already listed,
+            and the first MAX_REPORTED_ERRORS errors.
+    """
+    started = time.perf_counter()
+    stats = {"read": 0, "invalid": 0, "appended": 0, "skipped": 0, "errors": []}
+    catalog = None
+    if store is None and os.path.isdir(CATALOG_DIR):
+        from Job_Catalog import JobCatalog
+        catalog = JobCatalog.default()
+        if not catalog.is_current():
+            catalog = None
+
+    # With a catalog, the whole feed is appended at once, the first occurrence of an ID winning
+    incoming: dict[int, tuple[int, str, str, int, str, str]] = {}
+    for rows, errors in read_feed(feed, chunk_rows):
+        stats["read"] += len(rows) + len(errors)
+        stats["invalid"] += len(errors)
+        stats["errors"].extend(errors[:MAX_REPORTED_ERRORS - len(stats["errors"])])
+        if catalog is not None:
+            for row in rows:
+                incoming.setdefault(row[0], row)
+            continue
+        jobs = [Job(title=title, company=company, salary=salary, location=location, description=description, id=id)
+                for id, title, company, salary, location, description in rows]
+        appended = len((store or JobStore.default()).append(jobs))
+        stats["appended"] += appended
+        stats["skipped"] += len(jobs) - appended
+
+    if catalog is not None:
+        stats["appended"] = catalog.append(list(incoming.values()))
+        stats["skipped"] = stats["read"] - stats["invalid"] - stats["appended"]
+    elif store is None and stats["appended"] and os.path.isdir(CATALOG_DIR):
+        from Job_Catalog import convert_csv
+        convert_csv(JOBS_FILE, CATALOG_DIR)
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+if __name__ == "__main__":
+    arguments = sys.argv[1:]
+    if not arguments or arguments[0] in ("-h", "--help"):
+        print("Usage: python API/Job_Ingest.py [--replace | --append] feed.csv [feed.jsonl ...]")
+        sys.exit(0 if arguments else 1)
+    if arguments[0] == "--append":
+        results = [append_feed(feed) for feed in arguments[1:]]
+    else:
+        replace = arguments[0] == "--replace"
+        results = [ingest(arguments[1:] if replace else arguments, replace=replace)]
+    for result in results:
+        for error in result.pop("errors"):
+            print(error)
+        print(", ".join(f"{name} {value:.2f}" if isinstance(value, float) else f"{name} {value}" for name, value in result.items()))
@@ -0,0 +1,275 @@
+from __future__ import annotations
+import multiprocessing
+import os
+import re
+import sys
+import time
+import zlib
+from typing import Callable, Iterable, Iterator
+import numpy as np
+from Candidate import Candidate
+from Job import Job, JobStore
+
+"""
+# Batch matcher
+Scores candidates against every job in the catalog and keeps the top k candidates per job,
+for recruiters' shortlists.
+
+A candidate is eligible for a job paying more than their minimum salary in their location,
+the same rule as Job.query_jobs. Candidates with no location are eligible everywhere.
+Eligible pairs are scored as
+    SALARY_WEIGHT * salary fit      1 at the ideal salary (or with none), falling linearly to 0 a full ideal salary away
+    + LOCATION_WEIGHT * location    1 if the candidate asked for the job's location, 0 if they have no preference
+    + SKILL_WEIGHT * skill overlap  share of the candidate's skill words found in the job's title and description
+
+Skill words are hashed into SKILL_DIMENSIONS buckets, so one chunk of jobs is scored against
+every eligible candidate with a single matrix product. Jobs are grouped by location and split
+into chunks of CHUNK_JOBS, which are scored in parallel on a pool of forked worker processes
+that share the catalog and candidate arrays copy-on-write. Candidates are split into one
+contiguous block per location plus a single block of candidates with no location, gathered
+once before the workers fork. A chunk is scored against its location's block and the shared
+block separately, and the two top k lists are merged.
+
+Run with: python API/Job_Matcher.py [k]
+The shortlists are saved to the session store, where RecruitingAgent.load_candidate_short_list reads them.
+"""
+
+SKILL_DIMENSIONS = 512
+CHUNK_JOBS = 128
+DEFAULT_K = 10
+SALARY_WEIGHT = 0.4
+LOCATION_WEIGHT = 0.2
+SKILL_WEIGHT = 0.4
+# Location code of candidates with no location preference
+ANY_LOCATION = -1
+
+_token_pattern = re.compile(r"[a-z0-9+#]+")
+
+def _skill_buckets(text: str) -> set[int]:
+    return {zlib.crc32(token.encode("utf-8")) % SKILL_DIMENSIONS for token in _token_pattern.findall(text.lower())}
+
+class _JobColumns:
+    """
+    The job columns the matcher needs. Text is read one chunk at a time.
+    """
+    def __init__(self, ids: np.ndarray, salaries: np.ndarray, location_codes: np.ndarray, locations: list[str], text: Callable[[int], str]) -> None:
+        self.ids = ids
+        self.salaries = salaries
+        self.location_codes = location_codes
+        self.locations = locations
+        self.text = text
+
+    @classmethod
+    def from_source(cls, source) -> _JobColumns:
+        # The columnar catalog is already in this shape, a JobStore is converted once
+        if hasattr(source, "columns"):
+            ids, salaries, location_codes, locations = source.columns()
+            return cls(ids, salaries, location_codes, locations, source.text)
+        jobs = source.jobs()
+        location_index: dict[str, int] = {}
+        location_codes = np.asarray([location_index.setdefault(str(job.get_location()), len(location_index)) for job in jobs], dtype=np.int32)
+        return cls(
+            np.asarray([job.get_id() for job in jobs], dtype=np.int64),
+            np.asarray([job.get_salary() for job in jobs], dtype=np.int64),
+            location_codes,
+            list(location_index),
+            lambda row: f"{jobs[row].get_title()} {jobs[row].get_description() or ''}",
+        )
+
+class _CandidateColumns:
+    """
+    Candidate profiles as arrays, with each location mapped to the catalog's location code.
+    """
+    def __init__(self, candidates: list[Candidate], locations: list[str]) -> None:
+        location_codes = {location: code for code, location in enumerate(locations)}
+        self.ids = np.asarray([candidate.get_id() for candidate in candidates], dtype=np.int64)
+        self.minimum_salaries = np.asarray([candidate.get_job_desires().minimum_salary or 0 for candidate in candidates], dtype=np.int64)
+        self.ideal_salaries = np.asarray([candidate.get_job_desires().ideal_salary or 0 for candidate in candidates], dtype=np.float32)
+        # Locations with no jobs get a code no job has
+        self.location_codes = np.asarray([
+            ANY_LOCATION if candidate.get_job_desires().location is None else location_codes.get(str(candidate.get_job_desires().location), len(locations))
+            for candidate in candidates
+        ], dtype=np.int32)
+        skills = np.zeros((len(candidates), SKILL_DIMENSIONS), dtype=np.float32)
+        for row, candidate in enumerate(candidates):
+            for bucket in _skill_buckets(" ".join(candidate.get_qualifications().skills or [])):
+                skills[row, bucket] = 1.0
+        skill_counts = np.maximum(skills.sum(axis=1), 1.0)
+
+        # Every candidate is in at most one block, so the blocks together hold one copy of the arrays
+        order = np.argsort(self.location_codes, kind="stable")
+        boundaries = np.searchsorted(self.location_codes[order], np.arange(ANY_LOCATION, len(locations) + 1))
+        blocks = [
+            _CandidateBlock(self, order[start:end], skills, skill_counts, LOCATION_WEIGHT if code != ANY_LOCATION else 0.0)
+            for code, start, end in zip(range(ANY_LOCATION, len(locations)), boundaries[:-1], boundaries[1:])
+        ]
+        self.anywhere = blocks[0]
+        self.by_location = blocks[1:]
+
+class _CandidateBlock:
+    """
+    Contiguous copies of the candidate arrays for some of the candidates, used as they are by
+    every chunk scored against them.
+    """
+    def __init__(self, candidates: _CandidateColumns, rows: np.ndarray, skills: np.ndarray, skill_counts: np.ndarray, location_score: float) -> None:
+        self.rows = rows
+        self.minimum_salaries = candidates.minimum_salaries[rows][:, None]
+        self.ideal_salaries = candidates.ideal_salaries[rows][:, None]
+        self.location_score = location_score
+        self.skills = skills[rows]
+        self.skill_counts = skill_counts[rows][:, None]
+
+class Matches:
+    """
+    The top k candidates for every job, best first.
+
+    Attributes:
+        job_ids (np.ndarray): int64, one entry per job, sorted.
+        candidate_ids (np.ndarray): int64, jobs x k, -1 where a job has fewer than k eligible candidates.
+        scores (np.ndarray): float32, jobs x k.
+    """
+    def __init__(self, job_ids: np.ndarray, candidate_ids: np.ndarray, scores: np.ndarray) -> None:
+        order = np.argsort(job_ids, kind="stable")
+        self.job_ids = job_ids[order]
+        self.candidate_ids = candidate_ids[order]
+        self.scores = scores[order]
+
+    def __len__(self) -> int:
+        return len(self.job_ids)
+
+    def shortlist(self, job_id: int) -> list[tuple[int, float]]:
+        """
+        Returns (candidate ID, score) pairs for one job, best first.
+        """
+        position = int(np.searchsorted(self.job_ids, job_id))
+        if position == len(self.job_ids) or self.job_ids[position] != job_id:
+            return []
+        return [
+            (int(candidate_id), float(score))
+            for candidate_id, score in zip(self.candidate_ids[position], self.scores[position])
+            if candidate_id >= 0
+        ]
+
+    def rows(self) -> Iterator[tuple[int, int, int, float]]:
+        """
+        Yields (job ID, rank, candidate ID, score) for every shortlisted candidate, rank 0 being the best.
+        """
+        positions, ranks = np.nonzero(self.candidate_ids >= 0)
+        for position, rank in zip(positions.tolist(), ranks.tolist()):
+            yield int(self.job_ids[position]), rank, int(self.candidate_ids[position, rank]), float(self.scores[position, rank])
+
+# Set in each worker by _init_worker, inherited through fork rather than pickled
+_state: tuple[_JobColumns, _CandidateColumns, int] | None = None
+
+def _init_worker(jobs: _JobColumns, candidates: _CandidateColumns, k: int) -> None:
+    global _state
+    _state = (jobs, candidates, k)
+
+def _score_block(block: _CandidateBlock, salaries: np.ndarray, job_skills: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Scores a chunk of jobs against one block of candidates.
+
+    Returns:
+        Per job, the rows of the block's top k candidates (-1 padded) and their scores (-inf padded).
+    """
+    top_rows = np.full((job_skills.shape[1], k), -1, dtype=np.int64)
+    top_scores = np.full((job_skills.shape[1], k), -np.inf, dtype=np.float32)
+    if len(block.rows) == 0:
+        return top_rows, top_scores
+
+    # candidates x jobs
+    ideal = block.ideal_salaries
+    with np.errstate(divide="ignore", invalid="ignore"):
+        salary_fit = np.where(ideal > 0, 1.0 - np.minimum(np.abs(salaries - ideal) / ideal, 1.0), 1.0)
+    scores = SALARY_WEIGHT * salary_fit + block.location_score
+    scores += SKILL_WEIGHT * np.minimum((block.skills @ job_skills) / block.skill_counts, 1.0)
+    scores[salaries <= block.minimum_salaries] = -np.inf
+
+    count = min(k, len(block.rows))
+    best = np.argpartition(-scores, count - 1, axis=0)[:count]
+    best_scores = np.take_along_axis(scores, best, axis=0)
+    top_rows[:, :count] = block.rows[best].T
+    top_scores[:, :count] = best_scores.T
+    return top_rows, top_scores
+
+def _score_chunk(job_rows: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Scores one chunk of same-location jobs against every candidate eligible for that location:
+    the location's own block and the block of candidates with no location.
+
+    Returns:
+        The chunk's job rows and, per job, the rows of its top k candidates (-1 padded) and their scores.
+    """
+    assert _state is not None
+    jobs, candidates, k = _state
+    local = candidates.by_location[int(jobs.location_codes[job_rows[0]])]
+    if len(local.rows) + len(candidates.anywhere.rows) == 0:
+        return job_rows, np.full((len(job_rows), k), -1, dtype=np.int64), np.zeros((len(job_rows), k), dtype=np.float32)
+
+    job_skills = np.zeros((SKILL_DIMENSIONS, len(job_rows)), dtype=np.float32)
+    for column, row in enumerate(job_rows):
+        job_skills[list(_skill_buckets(jobs.text(int(row)))), column] = 1.0
+    salaries = jobs.salaries[job_rows].astype(np.float32)[None, :]
+
+    local_rows, local_scores = _score_block(local, salaries, job_skills, k)
+    anywhere_rows, anywhere_scores = _score_block(candidates.anywhere, salaries, job_skills, k)
+    rows = np.concatenate([local_rows, anywhere_rows], axis=1)
+    scores = np.concatenate([local_scores, anywhere_scores], axis=1)
+    order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+    top_rows = np.take_along_axis(rows, order, axis=1)
+    top_scores = np.take_along_axis(scores, order, axis=1)
+    eligible = np.isfinite(top_scores)
+    return job_rows, np.where(eligible, top_rows, -1), np.where(eligible, top_scores, 0.0).astype(np.float32)
+
+def _chunks(location_codes: np.ndarray, chunk_jobs: int) -> Iterator[np.ndarray]:
+    """
+    Splits job rows into chunks that each hold jobs of a single location.
+    """
+    order = np.argsort(location_codes, kind="stable")
+    boundaries = np.flatnonzero(np.diff(location_codes[order])) + 1
+    for group in np.split(order, boundaries):
+        for start in range(0, len(group), chunk_jobs):
+            yield group[start:start + chunk_jobs]
+
+def match(candidates: Iterable[Candidate], source: JobStore | None = None, k: int = DEFAULT_K, processes: int | None = None, chunk_jobs: int = CHUNK_JOBS) -> Matches:
+    """
+    Finds the top k candidates for every job.
+
+    Args:
+        candidates (Iterable[Candidate]): Candidates to match.
+        source (JobStore | JobCatalog | None): Jobs to match against, Job.job_source() by default.
+        k (int): Candidates kept per job.
+        processes (int | None): Worker processes, os.cpu_count() by default. 1 scores in this process.
+        chunk_jobs (int): Jobs scored per task.
+    """
+    jobs = _JobColumns.from_source(source or Job.job_source())
+    candidate_columns = _CandidateColumns(list(candidates), jobs.locations)
+    candidate_rows = np.full((len(jobs.ids), k), -1, dtype=np.int64)
+    scores = np.zeros((len(jobs.ids), k), dtype=np.float32)
+    chunks = _chunks(jobs.location_codes, chunk_jobs)
+
+    processes = processes or os.cpu_count() or 1
+    # Workers must be forked to share the arrays, elsewhere everything runs in this process
+    if processes > 1 and "fork" in multiprocessing.get_all_start_methods():
+        with multiprocessing.get_context("fork").Pool(processes, _init_worker, (jobs, candidate_columns, k)) as pool:
+            results = list(pool.imap_unordered(_score_chunk, chunks))
+    else:
+        _init_worker(jobs, candidate_columns, k)
+        results = [_score_chunk(chunk) for chunk in chunks]
+
+    for job_rows, top_rows, top_scores in results:
+        candidate_rows[job_rows] = top_rows
+        scores[job_rows] = top_scores
+    candidate_ids = np.where(candidate_rows >= 0, candidate_columns.ids[np.maximum(candidate_rows, 0)] if len(candidate_columns.ids) else -1, -1)
+    return Matches(np.asarray(jobs.ids, dtype=np.int64), candidate_ids, scores)
+
+if __name__ == "__main__":
+    from Session_Store import SessionStore, STORE_FILE
+    k = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_K
+    store = SessionStore()
+    started = time.perf_counter()
+    candidates = list(store.candidates())
+    matches = match(candidates, k=k)
+    store.save_shortlists(matches)
+    store.close()
+    print(f"Matched {len(candidates)} candidates against {len(matches)} jobs in {time.perf_counter() - started:.1f}s, shortlists saved to {STORE_FILE}")
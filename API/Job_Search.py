@@ -0,0 +1,178 @@
+from __future__ import annotations
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+import zlib
+import numpy as np
+from Job import Job, JOBS_FILE
+
+"""
+# Semantic job index
+Hashed word unigrams and bigrams weighted by TF-IDF, one L2-normalized row per job description.
+Everything runs locally on the CPU; scoring a query is a dot product against the matrix.
+
+vectors.npy     float32, rows x DIMENSIONS
+idf.npy         float32, DIMENSIONS
+ids.npy         int64, the job ID of each row
+meta.json       mtime of the source CSV
+
+Build with: python API/Job_Search.py [index_dir]
+"""
+
+INDEX_DIR = "API/Jobs.index"
+DIMENSIONS = 1024
+# Rows scored per matrix product, keeps the temporary score matrix small
+SCORE_CHUNK_ROWS = 65536
+
+_token_pattern = re.compile(r"[a-z0-9]+")
+
+def _features(text: str) -> list[str]:
+    tokens = _token_pattern.findall(text.lower())
+    return tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+
+def hash_counts(texts: list[str]) -> np.ndarray:
+    """
+    Hashes each text's unigrams and bigrams into a row of signed term counts.
+
+    crc32 is used rather than hash() so the buckets are stable across processes.
+    """
+    counts = np.zeros((len(texts), DIMENSIONS), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for feature in _features(text):
+            digest = zlib.crc32(feature.encode("utf-8"))
+            counts[row, digest % DIMENSIONS] += 1.0 if digest & 0x80000000 else -1.0
+    return counts
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def _weigh(counts: np.ndarray, idf: np.ndarray) -> np.ndarray:
+    # Sublinear term frequency keeps repeated words from dominating a description
+    weights = np.sign(counts) * np.log1p(np.abs(counts))
+    return _normalize(weights * idf)
+
+def build_index(jobs: list[Job], index_dir: str | None = INDEX_DIR, source_path: str = JOBS_FILE) -> JobIndex:
+    """
+    Vectorizes the description of every job and optionally saves the index.
+
+    Args:
+        jobs (list[Job]): Jobs to index.
+        index_dir (str | None): Directory to save the index to, or None to keep it in memory.
+        source_path (str): Catalog the jobs came from, used to detect a stale index.
+    """
+    counts = hash_counts([str(job.get_description() or "") for job in jobs])
+    document_frequency = np.count_nonzero(counts, axis=0)
+    idf = np.log((1 + len(jobs)) / (1 + document_frequency)).astype(np.float32) + 1.0
+    vectors = _weigh(counts, idf).astype(np.float32)
+    ids = np.asarray([job.get_id() for job in jobs], dtype=np.int64)
+    source_mtime = os.stat(source_path).st_mtime_ns
+
+    if index_dir is not None:
+        building_dir = index_dir + ".building"
+        shutil.rmtree(building_dir, ignore_errors=True)
+        os.makedirs(building_dir)
+        np.save(os.path.join(building_dir, "vectors.npy"), vectors)
+        np.save(os.path.join(building_dir, "idf.npy"), idf)
+        np.save(os.path.join(building_dir, "ids.npy"), ids)
+        with open(os.path.join(building_dir, "meta.json"), "w") as meta_file:
+            json.dump({"source_mtime_ns": source_mtime, "dimensions": DIMENSIONS}, meta_file)
+        shutil.rmtree(index_dir, ignore_errors=True)
+        os.rename(building_dir, index_dir)
+
+    return JobIndex(vectors, idf, ids, source_mtime)
+
+class JobIndex:
+    """
+    Precomputed TF-IDF matrix over job descriptions.
+
+    Args:
+        vectors (np.ndarray): L2-normalized rows, one per job.
+        idf (np.ndarray): Inverse document frequency of each hashed dimension.
+        ids (np.ndarray): Job ID of each row.
+        source_mtime (int): mtime of the catalog the index was built from.
+    """
+    __default: JobIndex | None = None
+    __default_lock = threading.Lock()
+
+    def __init__(self, vectors: np.ndarray, idf: np.ndarray, ids: np.ndarray, source_mtime: int) -> None:
+        self.__vectors = vectors
+        self.__idf = idf
+        self.__ids = ids
+        self.__source_mtime = source_mtime
+
+    @classmethod
+    def load(cls, index_dir: str = INDEX_DIR) -> JobIndex:
+        """
+        Memory-maps a saved index so worker processes share its pages.
+        """
+        with open(os.path.join(index_dir, "meta.json")) as meta_file:
+            meta = json.load(meta_file)
+        return cls(
+            np.load(os.path.join(index_dir, "vectors.npy"), mmap_mode="r"),
+            np.load(os.path.join(index_dir, "idf.npy")),
+            np.load(os.path.join(index_dir, "ids.npy"), mmap_mode="r"),
+            meta["source_mtime_ns"],
+        )
+
+    @classmethod
+    def default(cls) -> JobIndex:
+        """
+        Returns the process-wide index for the job catalog.
+
+        Loads the saved index when it matches the catalog, otherwise builds one in memory.
+        """
+        with cls.__default_lock:
+            source_mtime = os.stat(JOBS_FILE).st_mtime_ns
+            if cls.__default is None or cls.__default.__source_mtime != source_mtime:
+                index = cls.load() if os.path.isdir(INDEX_DIR) else None
+                if index is None or index.__source_mtime != source_mtime:
+                    index = build_index(Job.job_source().jobs(), index_dir=None)
+                cls.__default = index
+            return cls.__default
+
+    def __len__(self) -> int:
+        return len(self.__ids)
+
+    def query_many(self, texts: list[str], limit: int) -> list[list[tuple[int, float]]]:
+        """
+        Scores a batch of query texts against every job with one matrix product per chunk.
+
+        Returns:
+            list[list[tuple[int, float]]]: For each text, up to limit (job ID, cosine score) pairs, best first.
+        """
+        limit = max(limit, 1)
+        queries = _weigh(hash_counts(texts), self.__idf)
+        best_scores = np.full((len(texts), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(texts), 0), dtype=np.int64)
+
+        for start in range(0, len(self.__ids), SCORE_CHUNK_ROWS):
+            scores = queries @ np.asarray(self.__vectors[start:start + SCORE_CHUNK_ROWS]).T
+            keep = min(limit, scores.shape[1])
+            top = np.argpartition(-scores, keep - 1, axis=1)[:, :keep]
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+            best_rows = np.concatenate([best_rows, top + start], axis=1)
+
+        results = []
+        for scores, rows in zip(best_scores, best_rows):
+            order = np.argsort(-scores, kind="stable")[:limit]
+            results.append([
+                (int(self.__ids[rows[i]]), float(scores[i]))
+                for i in order if scores[i] > 0
+            ])
+        return results
+
+    def query(self, text: str, limit: int) -> list[tuple[int, float]]:
+        """
+        Returns up to limit (job ID, cosine score) pairs for one query text, best first.
+        """
+        return self.query_many([text], limit)[0]
+
+if __name__ == "__main__":
+    index_dir = sys.argv[1] if len(sys.argv) > 1 else INDEX_DIR
+    index = build_index(Job.job_source().jobs(), index_dir=index_dir)
+    print(f"Indexed {len(index)} job descriptions into {index_dir}")
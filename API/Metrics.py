@@ -0,0 +1,254 @@
+from __future__ import annotations
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager, suppress
+from contextvars import ContextVar
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Iterator, List, Tuple
+
+"""
+# Metrics
+Prometheus-style counters and histograms for agent turns, model calls, tool calls and job
+queries, plus a trace of the current user turn and a ring buffer of recent slow turns.
+
+Every top-level Agent.get_response is one turn. Model calls, tool calls and job queries made
+while it runs, including re-prompts after function calls, are added to the turn's trace.
+render() returns every metric in the Prometheus text exposition format.
+"""
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 50, 100, 1000, 10000, 100000)
+CHARACTERS_PER_TOKEN = 4
+# Turns slower than this, or cut short by a limit, are kept in the slow turn ring buffer
+SLOW_TURN_SECONDS = 5.0
+SLOW_TURN_BUFFER = 100
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted(labels.items()))
+
+def _format_labels(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+class Counter:
+    """
+    Monotonically increasing count, optionally split by labels.
+    """
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+        self.__lock = threading.Lock()
+        self.__values: Dict[Labels, float] = {}
+        REGISTRY.append(self)
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = _label_key(labels)
+        with self.__lock:
+            self.__values[key] = self.__values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self.__values.get(_label_key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.__lock:
+            for labels, value in self.__values.items():
+                lines.append(f"{self.name}{_format_labels(labels)} {value}")
+        return lines
+
+class Gauge:
+    """
+    Value that can go up and down, optionally split by labels.
+    """
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+        self.__lock = threading.Lock()
+        self.__values: Dict[Labels, float] = {}
+        REGISTRY.append(self)
+
+    def set(self, value: float, **labels: str) -> None:
+        key = _label_key(labels)
+        with self.__lock:
+            self.__values[key] = value
+
+    def value(self, **labels: str) -> float:
+        return self.__values.get(_label_key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with self.__lock:
+            for labels, value in self.__values.items():
+                lines.append(f"{self.name}{_format_labels(labels)} {value}")
+        return lines
+
+class Histogram:
+    """
+    Distribution of observations over fixed buckets, optionally split by labels.
+    """
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.__buckets = buckets
+        self.__lock = threading.Lock()
+        # labels -> (per-bucket counts with a final +Inf bucket, sum, count)
+        self.__values: Dict[Labels, Tuple[List[int], float, int]] = {}
+        REGISTRY.append(self)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _label_key(labels)
+        with self.__lock:
+            counts, total, count = self.__values.get(key) or ([0] * (len(self.__buckets) + 1), 0.0, 0)
+            counts[bisect_left(self.__buckets, value)] += 1
+            self.__values[key] = (counts, total + value, count + 1)
+
+    def count(self, **labels: str) -> int:
+        values = self.__values.get(_label_key(labels))
+        return values[2] if values else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.__lock:
+            for labels, (counts, total, count) in self.__values.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.__buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else str(bound)
+                    lines.append(f"{self.name}_bucket{_format_labels(labels, (('le', le),))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+REGISTRY: List[Counter | Gauge | Histogram] = []
+
+TURN_SECONDS = Histogram("agent_turn_seconds", "Wall-clock time of a user turn, including re-prompts and tool calls.")
+TURN_FALLBACKS = Counter("agent_turn_fallbacks_total", "Turns cut short by the tool hop limit or deadline.")
+TURN_DEPTH = Histogram("agent_turn_depth", "Model round-trips per user turn.", COUNT_BUCKETS)
+MODEL_SECONDS = Histogram("agent_model_seconds", "Latency of a single model call.")
+MODEL_CALLS = Counter("agent_model_calls_total", "Model calls made by agents.")
+MODEL_ERRORS = Counter("agent_model_errors_total", "Model calls that raised.")
+CONTEXT_BYTES = Histogram("agent_context_bytes", "Size of the context sent with a model call.", SIZE_BUCKETS)
+CONTEXT_TOKENS = Histogram("agent_context_tokens", "Estimated tokens of the context sent with a model call.", SIZE_BUCKETS)
+TOOL_SECONDS = Histogram("agent_tool_seconds", "Latency of a tool call from the model.")
+TOOL_ERRORS = Counter("agent_tool_errors_total", "Tool calls that raised.")
+JOBS_SCANNED = Counter("jobs_scanned_total", "Jobs examined by job queries.")
+JOBS_RETURNED = Counter("jobs_returned_total", "Jobs returned to the model by job queries.")
+
+def render() -> str:
+    """
+    Returns every metric in the Prometheus text exposition format.
+    """
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# --- Turn tracing ---
+@dataclass
+class TurnTrace:
+    """
+    Where the time of one user turn went.
+    """
+    agent: str
+    started_at: float = field(default_factory=time.time)
+    seconds: float = 0.0
+    depth: int = 0
+    model_calls: int = 0
+    model_seconds: float = 0.0
+    context_bytes: List[int] = field(default_factory=list)
+    tool_calls: List[Tuple[str, float]] = field(default_factory=list)
+    jobs_scanned: int = 0
+    jobs_returned: int = 0
+    error: str | None = None
+    fallback: str | None = None
+
+_current_turn: ContextVar[TurnTrace | None] = ContextVar("current_turn", default=None)
+_slow_turns: deque = deque(maxlen=SLOW_TURN_BUFFER)
+_slow_turns_lock = threading.Lock()
+
+def current_turn() -> TurnTrace | None:
+    return _current_turn.get()
+
+@contextmanager
+def turn(agent: str) -> Iterator[TurnTrace]:
+    """
+    Traces a user turn. Nested calls, such as re-prompts after tool calls, join the outer turn.
+    """
+    trace = _current_turn.get()
+    if trace is not None:
+        yield trace
+        return
+
+    trace = TurnTrace(agent)
+    token = _current_turn.set(trace)
+    started = time.perf_counter()
+    try:
+        yield trace
+    except BaseException as error:
+        trace.error = repr(error)
+        raise
+    finally:
+        # A streamed turn's generator may be closed from another context
+        with suppress(ValueError):
+            _current_turn.reset(token)
+        trace.seconds = time.perf_counter() - started
+        TURN_SECONDS.observe(trace.seconds, agent=agent)
+        TURN_DEPTH.observe(trace.depth, agent=agent)
+        if trace.seconds >= SLOW_TURN_SECONDS or trace.fallback is not None:
+            with _slow_turns_lock:
+                _slow_turns.append(trace)
+
+@contextmanager
+def model_call(model: str, context: List[str]) -> Iterator[None]:
+    """
+    Times one model call and records the size of the context it sends.
+    """
+    context_bytes = sum(len(section.encode("utf-8")) for section in context)
+    CONTEXT_BYTES.observe(context_bytes, model=model)
+    CONTEXT_TOKENS.observe(context_bytes // CHARACTERS_PER_TOKEN, model=model)
+    MODEL_CALLS.inc(model=model)
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        MODEL_ERRORS.inc(model=model)
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        MODEL_SECONDS.observe(seconds, model=model)
+        trace = _current_turn.get()
+        if trace is not None:
+            trace.depth += 1
+            trace.model_calls += 1
+            trace.model_seconds += seconds
+            trace.context_bytes.append(context_bytes)
+
+def record_tool_call(tool: str, seconds: float, failed: bool) -> None:
+    TOOL_SECONDS.observe(seconds, tool=tool)
+    if failed:
+        TOOL_ERRORS.inc(tool=tool)
+    trace = _current_turn.get()
+    if trace is not None:
+        trace.tool_calls.append((tool, seconds))
+
+def record_job_query(query: str, scanned: int, returned: int) -> None:
+    JOBS_SCANNED.inc(scanned, query=query)
+    JOBS_RETURNED.inc(returned, query=query)
+    trace = _current_turn.get()
+    if trace is not None:
+        trace.jobs_scanned += scanned
+        trace.jobs_returned += returned
+
+def slow_turns() -> List[dict]:
+    """
+    Returns the most recent slow turns, oldest first.
+    """
+    with _slow_turns_lock:
+        return [asdict(trace) for trace in _slow_turns]
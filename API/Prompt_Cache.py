@@ -0,0 +1,133 @@
+from __future__ import annotations
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING
+import Metrics
+
+if TYPE_CHECKING:
+    from google import genai
+    from google.genai import types
+
+"""
+# Prompt cache
+Uploads the static prefix of an agent's requests, the behavioral instructions and function
+declarations, to Gemini's explicit context cache once per process. Per-turn requests then
+reference the cached content by name and only send the candidate profile and history.
+The handle's TTL is extended shortly before it expires.
+Requests served from the cache and the prefix bytes they didn't send are exported at /metrics.
+"""
+
+DEFAULT_TTL_SECONDS = 60 * 60
+# Extend the TTL when less than this is left, so no request references an expired handle
+REFRESH_MARGIN_SECONDS = 5 * 60
+# After a failed create, such as a prefix below the model's minimum cacheable size, send the prefix inline for this long
+RETRY_AFTER_SECONDS = 10 * 60
+
+logger = logging.getLogger(__name__)
+FAILURES = Metrics.Counter("prompt_cache_failures_total", "Failed cached-content creates and TTL refreshes, by operation.")
+HITS = Metrics.Counter("prompt_cache_hits_total", "Requests that referenced a cached prefix instead of sending it.")
+SAVED_BYTES = Metrics.Counter("prompt_cache_saved_bytes_total", "Prefix bytes not sent because requests referenced the cached prefix.")
+
+class PromptCache:
+    """
+    Server-side cached-content handle for one static request prefix.
+
+    Args:
+        client (genai.Client): Client used to create and refresh the cached content.
+        model (str): Model the cached content is created for.
+        system_instruction (str): Static behavioral instructions.
+        functions (list): Function declarations exposed to the model.
+        ttl_seconds (int): Lifetime requested for the cached content.
+    """
+    __caches: dict[tuple[str, str], PromptCache] = {}
+    __caches_lock = threading.Lock()
+
+    def __init__(self, client: genai.Client, model: str, system_instruction: str, functions: list, ttl_seconds: int = DEFAULT_TTL_SECONDS) -> None:
+        self.__client = client
+        self.__model = model
+        self.__system_instruction = system_instruction
+        self.__functions = functions
+        self.__ttl_seconds = ttl_seconds
+        self.__lock = threading.Lock()
+
+        self.__name: str | None = None
+        self.__expires_at = 0.0
+        self.__retry_at = 0.0
+        self.__prefix_bytes = len(system_instruction.encode("utf-8")) + len(json.dumps(functions).encode("utf-8"))
+
+    @classmethod
+    def for_prefix(cls, client: genai.Client, model: str, system_instruction: str, functions: list) -> PromptCache:
+        """
+        Returns the process-wide PromptCache for a model and static prefix, creating it on first use.
+        """
+        prefix_hash = hashlib.sha256(json.dumps([system_instruction, functions], sort_keys=True).encode("utf-8")).hexdigest()
+        key = (model, prefix_hash)
+        with cls.__caches_lock:
+            if key not in cls.__caches:
+                cls.__caches[key] = cls(client, model, system_instruction, functions)
+            return cls.__caches[key]
+
+    def name(self) -> str | None:
+        """
+        Returns the name of a live cached content handle, creating or refreshing it as needed.
+        Returns None if the prefix can't be cached right now, so it should be sent inline.
+        """
+        now = time.time()
+        if self.__name is None or now > self.__expires_at - REFRESH_MARGIN_SECONDS:
+            with self.__lock:
+                if self.__name is None and now >= self.__retry_at:
+                    self.__create(now)
+                elif self.__name is not None and now > self.__expires_at - REFRESH_MARGIN_SECONDS:
+                    self.__refresh(now)
+        if self.__name is not None:
+            HITS.inc(model=self.__model)
+            SAVED_BYTES.inc(self.__prefix_bytes, model=self.__model)
+        return self.__name
+
+    def config(self) -> types.GenerateContentConfig | None:
+        """
+        Returns a config that references the cached prefix, or None if it isn't cached.
+        """
+        name = self.name()
+        if name is None:
+            return None
+        from google.genai import types
+        return types.GenerateContentConfig(cached_content=name)
+
+    def __create(self, now: float) -> None:
+        from google.genai import types
+        try:
+            cached_content = self.__client.caches.create(
+                model=self.__model,
+                config=types.CreateCachedContentConfig(
+                    system_instruction=self.__system_instruction,
+                    tools=[types.Tool(function_declarations=self.__functions)] if self.__functions else None, # type: ignore
+                    ttl=f"{self.__ttl_seconds}s",
+                ),
+            )
+        except Exception as error:
+            # Sending the prefix inline until the retry
+            FAILURES.inc(operation="create", error=type(error).__name__)
+            logger.warning("Prompt cache for %s unavailable, sending the prefix inline for %ds: %s", self.__model, RETRY_AFTER_SECONDS, error)
+            self.__retry_at = now + RETRY_AFTER_SECONDS
+            return
+        self.__name = cached_content.name
+        self.__expires_at = now + self.__ttl_seconds
+
+    def __refresh(self, now: float) -> None:
+        from google.genai import types
+        try:
+            self.__client.caches.update(
+                name=str(self.__name),
+                config=types.UpdateCachedContentConfig(ttl=f"{self.__ttl_seconds}s"),
+            )
+            self.__expires_at = now + self.__ttl_seconds
+        except Exception as error:
+            # The handle may already be gone, create a new one
+            FAILURES.inc(operation="refresh", error=type(error).__name__)
+            logger.warning("Prompt cache %s refresh failed, recreating: %s", self.__name, error)
+            self.__name = None
+            self.__create(now)
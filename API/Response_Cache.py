@@ -0,0 +1,112 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any
+import Metrics
+
+"""
+# Response cache
+Caches model responses keyed on a hash of the model name, tool declarations and context,
+so identical requests skip the generate_content round-trip.
+Entries live in a bounded in-memory LRU, with an optional on-disk tier that survives
+restarts and makes offline benchmark runs repeatable.
+"""
+
+DEFAULT_MAX_ENTRIES = 1024
+
+LOOKUPS = Metrics.Counter("response_cache_lookups_total", "Response cache lookups by result: hit, disk_hit or miss.")
+
+class ResponseCache:
+    """
+    Two-tier LRU cache of GenerateContentResponse objects.
+
+    Args:
+        max_entries (int): Maximum number of responses kept in memory.
+        directory (str | None): Directory for the on-disk tier, or None to keep responses in memory only.
+    """
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, directory: str | None = None) -> None:
+        self.__max_entries = max_entries
+        self.__directory = directory
+        self.__lock = threading.Lock()
+        self.__entries: OrderedDict[str, Any] = OrderedDict()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model: str, functions: list, contents: list) -> str:
+        """
+        Hashes everything that determines the model's response.
+        """
+        payload = json.dumps([model, functions, contents], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def get(self, key: str) -> Any | None:
+        """
+        Returns the cached response for key, or None on a miss.
+        """
+        with self.__lock:
+            response = self.__entries.get(key)
+            if response is not None:
+                self.__entries.move_to_end(key)
+                self.hits += 1
+                LOOKUPS.inc(result="hit")
+                return response
+
+        response = self.__read_disk(key)
+        with self.__lock:
+            if response is None:
+                self.misses += 1
+                LOOKUPS.inc(result="miss")
+                return None
+            self.disk_hits += 1
+            LOOKUPS.inc(result="disk_hit")
+            self.__remember(key, response)
+            return response
+
+    def put(self, key: str, response: Any) -> None:
+        with self.__lock:
+            self.__remember(key, response)
+        self.__write_disk(key, response)
+
+    def stats(self) -> dict[str, int]:
+        return {"entries": len(self.__entries), "hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses}
+
+    def __remember(self, key: str, response: Any) -> None:
+        # Caller holds self.__lock
+        self.__entries[key] = response
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.__max_entries:
+            self.__entries.popitem(last=False)
+
+    def __path(self, key: str) -> str:
+        return os.path.join(str(self.__directory), key[:2], f"{key}.json")
+
+    def __read_disk(self, key: str) -> Any | None:
+        if self.__directory is None or not os.path.exists(self.__path(key)):
+            return None
+        from google.genai import types
+        with open(self.__path(key)) as cache_file:
+            return types.GenerateContentResponse.model_validate_json(cache_file.read())
+
+    def __write_disk(self, key: str, response: Any) -> None:
+        # Only SDK responses can be serialized
+        if self.__directory is None or not hasattr(response, "model_dump_json"):
+            return
+        path = self.__path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so readers never see a partial file
+        descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(descriptor, "w") as cache_file:
+            cache_file.write(response.model_dump_json(exclude_none=True))
+        os.replace(temporary_path, path)
@@ -0,0 +1,193 @@
+from __future__ import annotations
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator
+import Metrics
+from Agent import Candidate, CandidateAgent
+from Session_Store import SessionStore
+from Response_Cache import ResponseCache
+
+"""
+# Session manager
+Holds one Candidate and CandidateAgent per user session.
+Sessions are created on first use and evicted least recently used first, once they
+expire or the registry exceeds its session count or memory cap.
+Requests for the same session are serialized by that session's lock, requests for
+different sessions run in parallel.
+With a SessionStore, profiles and conversations are saved in the background and evicted
+or restarted sessions are rehydrated from it on first access.
+"""
+
+DEFAULT_MAX_SESSIONS = 10000
+DEFAULT_TTL_SECONDS = 60 * 60
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Rough fixed cost of a Candidate, CandidateAgent and their bookkeeping
+SESSION_OVERHEAD_BYTES = 16 * 1024
+
+EVICTIONS = Metrics.Counter("session_evictions_total", "Sessions evicted from memory since the process started.")
+
+@dataclass
+class Session:
+    """
+    One user's candidate profile and agent.
+    """
+    session_id: str
+    candidate: Candidate
+    agent: CandidateAgent
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    last_used: float = field(default_factory=time.monotonic)
+    # Requests currently holding or waiting on the session, it is never evicted while this is non-zero
+    active: int = 0
+    size_bytes: int = SESSION_OVERHEAD_BYTES
+
+    def estimate_size(self) -> int:
+        # The transcript is held once in full and once in the context window, 1-4 bytes per character
+        return SESSION_OVERHEAD_BYTES + 2 * self.agent.get_history_characters() + len(str(self.candidate))
+
+class SessionManager:
+    """
+    Registry of active sessions keyed by session ID.
+
+    Args:
+        gemini_api_key (str): API key passed to every CandidateAgent.
+        max_sessions (int): Maximum number of sessions kept in memory.
+        ttl_seconds (float): Sessions idle for longer than this are evicted.
+        max_bytes (int): Approximate memory cap for all sessions together.
+        store (SessionStore | None): Where sessions are persisted and rehydrated from.
+        response_cache (ResponseCache | None): Response cache shared by every session's agent.
+        prompt_cache (bool): Serve every agent's static prefix from Gemini's context cache.
+    """
+    def __init__(
+        self,
+        gemini_api_key: str,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        store: SessionStore | None = None,
+        response_cache: ResponseCache | None = None,
+        prompt_cache: bool = False,
+    ) -> None:
+        self.__gemini_api_key = gemini_api_key
+        self.__store = store
+        self.__response_cache = response_cache
+        self.__prompt_cache = prompt_cache
+        self.__max_sessions = max_sessions
+        self.__ttl_seconds = ttl_seconds
+        self.__max_bytes = max_bytes
+
+        self.__lock = threading.Lock()
+        # Least recently used first
+        self.__sessions: OrderedDict[str, Session] = OrderedDict()
+        self.__total_bytes = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.__sessions)
+
+    def get_total_bytes(self) -> int:
+        return self.__total_bytes
+
+    def create_session(self, session_id: str) -> Session:
+        """
+        Rehydrates a saved session, or instantiates an empty candidate and their candidate agent.
+        """
+        saved = self.__store.load(session_id) if self.__store is not None else None
+        candidate = saved.candidate if saved is not None else Candidate("Candidate", "")
+        agent = CandidateAgent(candidate, self.__gemini_api_key, response_cache=self.__response_cache, prompt_cache=self.__prompt_cache)
+        if saved is not None:
+            agent.load_conversation_history(saved.messages, saved.summary, saved.folded, saved.job_history)
+
+        store = self.__store
+        if store is not None:
+            candidate.set_change_listener(lambda candidate: store.save_candidate(session_id, candidate))
+            agent.set_message_listener(lambda seq, message: store.save_message(session_id, seq, message))
+            agent.set_summary_listener(lambda summary, folded: store.save_summary(session_id, summary, folded))
+            agent.job_history.set_change_listener(lambda job_history: store.save_job_history(session_id, job_history))
+            if saved is None:
+                store.save_candidate(session_id, candidate)
+
+        session = Session(session_id, candidate, agent)
+        session.size_bytes = session.estimate_size()
+        return session
+
+    @contextmanager
+    def session(self, session_id: str) -> Iterator[Session]:
+        """
+        Checks out a session, creating it if needed, and holds its lock for the duration.
+
+        Usage:
+            with manager.session(session_id) as session:
+                session.agent.get_response(message)
+        """
+        with self.__lock:
+            session = self.__sessions.get(session_id)
+            if session is not None:
+                self.__sessions.move_to_end(session_id)
+                session.active += 1
+
+        if session is None:
+            # Loading from the store happens outside the registry lock
+            created = self.create_session(session_id)
+            with self.__lock:
+                session = self.__sessions.get(session_id)
+                if session is None:
+                    session = created
+                    self.__sessions[session_id] = session
+                    self.__total_bytes += session.size_bytes
+                self.__sessions.move_to_end(session_id)
+                session.active += 1
+
+        try:
+            with session.lock:
+                yield session
+        finally:
+            with self.__lock:
+                session.active -= 1
+                session.last_used = time.monotonic()
+                size_bytes = session.estimate_size()
+                if self.__sessions.get(session_id) is session:
+                    self.__total_bytes += size_bytes - session.size_bytes
+                session.size_bytes = size_bytes
+                self.__evict()
+
+    def remove(self, session_id: str) -> None:
+        """
+        Drops a session immediately, for example when the user logs out.
+        """
+        with self.__lock:
+            session = self.__sessions.pop(session_id, None)
+            if session is not None:
+                self.__total_bytes -= session.size_bytes
+
+    def evict_expired(self) -> None:
+        """
+        Evicts idle sessions. Also runs after every request.
+        """
+        with self.__lock:
+            self.__evict()
+
+    def __evict(self) -> None:
+        # Caller holds self.__lock. Walks from least to most recently used, and usually stops
+        # at the first session, so the victims are collected before any is deleted.
+        now = time.monotonic()
+        count = len(self.__sessions)
+        total_bytes = self.__total_bytes
+        victims = []
+        for session_id, session in self.__sessions.items():
+            over_limit = count > self.__max_sessions or total_bytes > self.__max_bytes
+            expired = now - session.last_used > self.__ttl_seconds
+            if not over_limit and not expired:
+                # Everything after this was used more recently
+                break
+            if session.active:
+                continue
+            victims.append(session_id)
+            count -= 1
+            total_bytes -= session.size_bytes
+        for session_id in victims:
+            self.__total_bytes -= self.__sessions.pop(session_id).size_bytes
+            self.evictions += 1
+            EVICTIONS.inc()
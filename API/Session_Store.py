@@ -0,0 +1,322 @@
+from __future__ import annotations
+import json
+import logging
+import queue
+import sqlite3
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
+import Metrics
+from Agent import Message
+from Candidate import Candidate, JobDesires, Qualifications
+from Job_History import JobHistory
+
+if TYPE_CHECKING:
+    from Job_Matcher import Matches
+
+"""
+# Session store
+SQLite persistence for candidate profiles, conversation histories and their summaries, and
+job histories, keyed by session ID.
+
+Writes are write-behind: callers only put the change on a queue and a background writer
+flushes queued changes in batched transactions. Several updates to one candidate within a
+batch are coalesced into a single row write, serialized by the writer rather than the caller.
+The same goes for conversation summaries and job histories.
+"""
+
+STORE_FILE = "API/Sessions.sqlite3"
+BATCH_SIZE = 500
+# Seconds the writer waits for more changes before flushing a partial batch
+FLUSH_INTERVAL = 0.2
+
+logger = logging.getLogger(__name__)
+WRITE_FAILURES = Metrics.Counter("session_store_lost_changes_total", "Queued session changes dropped because their batch failed to write.")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS candidates (
+    session_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    job_desires TEXT NOT NULL,
+    qualifications TEXT NOT NULL,
+    candidate_id INTEGER
+);
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    sender TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+);
+CREATE TABLE IF NOT EXISTS summaries (
+    session_id TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    folded INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shortlists (
+    job_id INTEGER NOT NULL,
+    rank INTEGER NOT NULL,
+    candidate_id INTEGER NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (job_id, rank)
+);
+CREATE TABLE IF NOT EXISTS job_histories (
+    session_id TEXT PRIMARY KEY,
+    state TEXT NOT NULL
+);
+"""
+
+@dataclass
+class SavedSession:
+    """
+    Everything saved for one session.
+
+    Attributes:
+        candidate (Candidate): The candidate profile.
+        messages (List[Message]): The conversation history.
+        summary (str): Summary of the earliest messages, empty if there is none.
+        folded (int): Number of messages, from the first, the summary replaces.
+        job_history (JobHistory): The job history, empty if it was never saved.
+    """
+    candidate: Candidate
+    messages: List[Message]
+    summary: str = ""
+    folded: int = 0
+    job_history: JobHistory = field(default_factory=JobHistory)
+
+class SessionStore:
+    """
+    Write-behind SQLite store for sessions.
+
+    Args:
+        path (str): SQLite database file.
+        batch_size (int): Maximum number of queued changes written per transaction.
+        flush_interval (float): Seconds to wait for more changes before writing a partial batch.
+    """
+    def __init__(self, path: str = STORE_FILE, batch_size: int = BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL) -> None:
+        self.__path = path
+        self.__batch_size = batch_size
+        self.__flush_interval = flush_interval
+        self.__queue: queue.Queue = queue.Queue()
+        self.__closed = False
+        # Queued change count per session, so a load never misses its own unwritten changes
+        self.__pending: dict[str, int] = {}
+        self.__pending_lock = threading.Lock()
+        # Notified whenever a batch is done, so a load waits for its own session's changes only
+        self.__written = threading.Condition(self.__pending_lock)
+
+        with self.__connect() as connection:
+            connection.executescript(_SCHEMA)
+
+        self.__writer = threading.Thread(target=self.__write_loop, name="session-store-writer", daemon=True)
+        self.__writer.start()
+
+    def __connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.__path, timeout=30)
+        # WAL lets request threads read while the writer commits
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    # --- Write-behind API, only queues ---
+    def save_candidate(self, session_id: str, candidate: Candidate) -> None:
+        self.__enqueue(("candidate", session_id, candidate))
+
+    def save_job_history(self, session_id: str, job_history: JobHistory) -> None:
+        self.__enqueue(("job_history", session_id, job_history))
+
+    def save_summary(self, session_id: str, summary: str, folded: int) -> None:
+        self.__enqueue(("summary", session_id, (summary, folded)))
+
+    def save_message(self, session_id: str, seq: int, message: Message) -> None:
+        self.__enqueue(("message", session_id, (seq, message.sender, message.recipient, str(message.content))))
+
+    def __enqueue(self, change: tuple) -> None:
+        with self.__pending_lock:
+            self.__pending[change[1]] = self.__pending.get(change[1], 0) + 1
+        self.__queue.put(change)
+
+    def flush(self) -> None:
+        """
+        Blocks until every queued change has been written.
+        """
+        self.__queue.join()
+
+    def __wait_written(self, session_id: str) -> None:
+        """
+        Blocks until every change queued for session_id has been written.
+        """
+        with self.__written:
+            while self.__pending.get(session_id):
+                self.__written.wait()
+
+    def close(self) -> None:
+        """
+        Writes every queued change and stops the writer.
+        """
+        if not self.__closed:
+            self.__closed = True
+            self.__queue.put(None)
+            self.__writer.join()
+
+    # --- Reads ---
+    def load(self, session_id: str) -> Optional[SavedSession]:
+        """
+        Loads a saved session.
+
+        Returns:
+            The saved session, or None if the session was never saved.
+        """
+        self.__wait_written(session_id)
+        connection = self.__connect()
+        try:
+            row = connection.execute(
+                "SELECT name, email, job_desires, qualifications, candidate_id FROM candidates WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            messages = [
+                Message(sender, recipient, content)
+                for sender, recipient, content in connection.execute(
+                    "SELECT sender, recipient, content FROM messages WHERE session_id = ? ORDER BY seq",
+                    (session_id,),
+                )
+            ]
+            summary_row = connection.execute("SELECT summary, folded FROM summaries WHERE session_id = ?", (session_id,)).fetchone()
+            job_history_row = connection.execute("SELECT state FROM job_histories WHERE session_id = ?", (session_id,)).fetchone()
+        finally:
+            connection.close()
+
+        summary, folded = summary_row if summary_row is not None else ("", 0)
+        job_history = JobHistory.from_state(json.loads(job_history_row[0])) if job_history_row is not None else JobHistory()
+        return SavedSession(SessionStore.__candidate(row), messages, summary, folded, job_history)
+
+    def candidates(self) -> Iterator[Candidate]:
+        """
+        Streams every saved candidate, for batch jobs such as matching.
+        """
+        self.flush()
+        connection = self.__connect()
+        try:
+            for row in connection.execute("SELECT name, email, job_desires, qualifications, candidate_id FROM candidates"):
+                yield SessionStore.__candidate(row)
+        finally:
+            connection.close()
+
+    # --- Recruiter shortlists, written directly by the batch matcher ---
+    def save_shortlists(self, matches: Matches) -> None:
+        """
+        Replaces every saved shortlist with the batch matcher's results, in one transaction.
+        """
+        with self.__connect() as connection:
+            connection.execute("DELETE FROM shortlists")
+            connection.executemany("INSERT INTO shortlists (job_id, rank, candidate_id, score) VALUES (?, ?, ?, ?)", matches.rows())
+
+    def load_shortlists(self, job_ids: Iterable[int]) -> Dict[int, List[Tuple[int, float]]]:
+        """
+        Returns job ID -> (candidate ID, score) pairs, best first, for each of job_ids.
+        Jobs without a saved shortlist get an empty list.
+        """
+        shortlists: Dict[int, List[Tuple[int, float]]] = {job_id: [] for job_id in job_ids}
+        connection = self.__connect()
+        try:
+            for job_id in shortlists:
+                shortlists[job_id] = [
+                    (candidate_id, score)
+                    for candidate_id, score in connection.execute(
+                        "SELECT candidate_id, score FROM shortlists WHERE job_id = ? ORDER BY rank",
+                        (job_id,),
+                    )
+                ]
+        finally:
+            connection.close()
+        return shortlists
+
+    @staticmethod
+    def __candidate(row: tuple) -> Candidate:
+        name, email, job_desires, qualifications, candidate_id = row
+        return Candidate(
+            name,
+            email,
+            JobDesires(**json.loads(job_desires)),
+            Qualifications(**json.loads(qualifications)),
+            id=candidate_id,
+        )
+
+    # --- Writer thread ---
+    def __write_loop(self) -> None:
+        connection = self.__connect()
+        stopping = False
+        while not stopping:
+            batch = [self.__queue.get()]
+            try:
+                while len(batch) < self.__batch_size:
+                    batch.append(self.__queue.get(timeout=self.__flush_interval))
+            except queue.Empty:
+                pass
+            if None in batch:
+                stopping = True
+            try:
+                self.__write_batch(connection, [change for change in batch if change is not None])
+            except Exception as error:
+                # Any failure, such as a payload that can't be serialized, only loses this batch,
+                # the writer keeps running so waiting loads and flushes return
+                WRITE_FAILURES.inc(len(batch), error=type(error).__name__)
+                lost_sessions = sorted({change[1] for change in batch if change is not None})
+                logger.exception("Session store lost %d changes of sessions %s", len(batch), ", ".join(lost_sessions))
+            finally:
+                with self.__pending_lock:
+                    for change in batch:
+                        if change is not None:
+                            self.__pending[change[1]] -= 1
+                            if not self.__pending[change[1]]:
+                                del self.__pending[change[1]]
+                    self.__written.notify_all()
+                for _ in batch:
+                    self.__queue.task_done()
+        connection.close()
+
+    @staticmethod
+    def __write_batch(connection: sqlite3.Connection, batch: list) -> None:
+        candidates = {}
+        job_histories = {}
+        summaries = {}
+        messages = []
+        for kind, session_id, payload in batch:
+            if kind == "candidate":
+                # Only the latest state of each candidate needs writing
+                candidates[session_id] = payload
+            elif kind == "job_history":
+                job_histories[session_id] = payload
+            elif kind == "summary":
+                summaries[session_id] = payload
+            else:
+                messages.append((session_id, *payload))
+
+        with connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO candidates (session_id, name, email, job_desires, qualifications, candidate_id) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        session_id,
+                        candidate.get_name(),
+                        candidate.get_email(),
+                        json.dumps(asdict(candidate.get_job_desires())),
+                        json.dumps(asdict(candidate.get_qualifications())),
+                        candidate.get_id(),
+                    )
+                    for session_id, candidate in candidates.items()
+                ],
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO summaries (session_id, summary, folded) VALUES (?, ?, ?)",
+                [(session_id, summary, folded) for session_id, (summary, folded) in summaries.items()],
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO job_histories (session_id, state) VALUES (?, ?)",
+                [(session_id, json.dumps(job_history.state())) for session_id, job_history in job_histories.items()],
+            )
+            connection.executemany("INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?)", messages)
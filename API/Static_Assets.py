@@ -0,0 +1,250 @@
+from __future__ import annotations
+import glob
+import gzip
+import hashlib
+import logging
+import os
+import re
+import sys
+import threading
+from dataclasses import dataclass, field
+import Metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+"""
+# Static assets
+Serves the chat client's pages and stylesheet from memory.
+
+Every asset is read once at startup with its gzip and brotli variants. Variants are built
+ahead of time with `python API/Static_Assets.py`; any that are missing or older than their
+source are compressed at load instead (brotli only when the brotli package is installed).
+Requests are answered without touching the filesystem, except in debug mode, where changed
+files are reloaded.
+
+Each representation has a strong ETag, and a matching If-None-Match gets a 304.
+Pages reference stylesheets with their content hash (style.css?v=<hash>), so a versioned
+asset is cached for a year while pages themselves are revalidated on every load.
+"""
+
+ASSET_PATTERNS = ("*.html", "*.css", "*.js")
+CONTENT_TYPES = {".html": "text/html; charset=utf-8", ".css": "text/css; charset=utf-8", ".js": "text/javascript; charset=utf-8"}
+# Preferred first, with the file suffix of the prebuilt variant
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+PAGE_CACHE_CONTROL = "no-cache"
+VERSIONED_CACHE_CONTROL = "public, max-age=31536000, immutable"
+UNVERSIONED_CACHE_CONTROL = "public, max-age=3600"
+
+logger = logging.getLogger(__name__)
+RELOAD_FAILURES = Metrics.Counter("static_asset_reload_failures_total", "Debug-mode asset reloads skipped because a file could not be read.")
+
+_reference_pattern = re.compile(r'(?P<attribute>href|src)="(?P<name>[^"?#:]+)"')
+
+@dataclass(slots=True)
+class Asset:
+    """
+    One file, ready to send.
+
+    Attributes:
+        content_type (str): Content-Type header value.
+        version (str): Content hash, also the ETag of the identity encoding.
+        bodies (dict[str, bytes]): Body for each content coding, "identity" included.
+        mtime_ns (int): Modification time of the source when it was loaded.
+    """
+    content_type: str
+    version: str
+    bodies: dict[str, bytes] = field(default_factory=dict)
+    mtime_ns: int = 0
+
+    def etag(self, encoding: str) -> str:
+        # A strong ETag identifies exact bytes, so every encoding needs its own
+        return f'"{self.version}"' if encoding == "identity" else f'"{self.version}-{encoding}"'
+
+def _compress(body: bytes, encoding: str) -> bytes | None:
+    if encoding == "gzip":
+        # mtime=0 keeps the output, and so the ETag, the same across builds
+        return gzip.compress(body, compresslevel=9, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(body, quality=11)
+    return None
+
+def _read_variant(path: str, suffix: str, source_mtime_ns: int) -> bytes | None:
+    """
+    Returns the prebuilt variant of path, or None if there is none or it is out of date.
+    """
+    variant_path = path + suffix
+    if not os.path.exists(variant_path) or os.stat(variant_path).st_mtime_ns < source_mtime_ns:
+        return None
+    with open(variant_path, "rb") as variant_file:
+        return variant_file.read()
+
+def _accepted_encodings(accept_encoding: str) -> set[str]:
+    """
+    Returns the content codings an Accept-Encoding header allows.
+    """
+    accepted = set()
+    for item in accept_encoding.split(","):
+        coding, _, parameters = item.strip().partition(";")
+        quality = parameters.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    if if_none_match.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in if_none_match.split(","))
+
+class StaticAssets:
+    """
+    In-memory copy of a directory of static files.
+
+    Args:
+        directory (str): Directory to serve, Client/ by default.
+        patterns (tuple[str, ...]): Glob patterns of the files to load.
+    """
+    def __init__(self, directory: str = "Client", patterns: tuple[str, ...] = ASSET_PATTERNS) -> None:
+        self.__directory = directory
+        self.__patterns = patterns
+        self.__lock = threading.Lock()
+        # Lowercased file name -> asset, so /Client/Chat.html finds chat.html
+        self.__assets: dict[str, Asset] = {}
+        self.__load()
+
+    def __paths(self) -> list[str]:
+        return sorted(path for pattern in self.__patterns for path in glob.glob(os.path.join(self.__directory, pattern)))
+
+    def __load(self) -> None:
+        """
+        Reads every asset. Stylesheets and scripts go first, so pages can reference their versions.
+        """
+        paths = sorted(self.__paths(), key=lambda path: path.endswith(".html"))
+        assets: dict[str, Asset] = {}
+        for path in paths:
+            with open(path, "rb") as asset_file:
+                body = asset_file.read()
+            mtime_ns = os.stat(path).st_mtime_ns
+            extension = os.path.splitext(path)[1]
+            if extension == ".html":
+                body = self.__version_references(body, assets)
+            asset = Asset(
+                content_type=CONTENT_TYPES.get(extension, "application/octet-stream"),
+                version=hashlib.sha256(body).hexdigest()[:16],
+                bodies={"identity": body},
+                mtime_ns=mtime_ns,
+            )
+            for encoding, suffix in ENCODINGS:
+                # Pages are rewritten above, so their prebuilt variants can't be used as is
+                variant = _read_variant(path, suffix, mtime_ns) if extension != ".html" else None
+                variant = variant or _compress(body, encoding)
+                # Tiny files can grow when compressed
+                if variant is not None and len(variant) < len(body):
+                    asset.bodies[encoding] = variant
+            assets[os.path.basename(path).lower()] = asset
+        self.__assets = assets
+
+    @staticmethod
+    def __version_references(body: bytes, assets: dict[str, Asset]) -> bytes:
+        """
+        Appends ?v=<hash> to references to loaded assets, such as href="style.css".
+        """
+        def versioned(match: re.Match) -> str:
+            asset = assets.get(match["name"].lower())
+            if asset is None:
+                return match[0]
+            return f'{match["attribute"]}="{match["name"]}?v={asset.version}"'
+        return _reference_pattern.sub(versioned, body.decode("utf-8")).encode("utf-8")
+
+    def reload_if_changed(self) -> None:
+        """
+        Reloads every asset if any file was added, removed or modified. For debug mode only,
+        as it stats every file.
+        """
+        with self.__lock:
+            try:
+                current = {os.path.basename(path).lower(): os.stat(path).st_mtime_ns for path in self.__paths()}
+                if current != {name: asset.mtime_ns for name, asset in self.__assets.items()}:
+                    self.__load()
+            except OSError as error:
+                # An editor may be replacing the file, keep the old copy until the next request
+                RELOAD_FAILURES.inc(error=type(error).__name__)
+                logger.warning("Static assets in %s not reloaded: %s", self.__directory, error)
+
+    def get(self, name: str) -> Asset | None:
+        return self.__assets.get(name.lower())
+
+    def respond(self, name: str, headers, version: str | None = None) -> tuple[int, bytes, dict[str, str]] | None:
+        """
+        Picks the representation of an asset for a request.
+
+        Args:
+            name (str): File name, matched case-insensitively.
+            headers: Request headers, read for Accept-Encoding and If-None-Match.
+            version (str | None): The v query parameter. Versioned requests for the current version are cached long-term.
+
+        Returns:
+            tuple[int, bytes, dict[str, str]] | None: Status, body and response headers, or None if there is no such asset.
+        """
+        asset = self.get(name)
+        if asset is None:
+            return None
+        accepted = _accepted_encodings(headers.get("Accept-Encoding", ""))
+        encoding = next((encoding for encoding, _ in ENCODINGS if encoding in accepted and encoding in asset.bodies), "identity")
+
+        if asset.content_type.startswith("text/html"):
+            cache_control = PAGE_CACHE_CONTROL
+        elif version == asset.version:
+            cache_control = VERSIONED_CACHE_CONTROL
+        else:
+            cache_control = UNVERSIONED_CACHE_CONTROL
+        response_headers = {
+            "Content-Type": asset.content_type,
+            "ETag": asset.etag(encoding),
+            "Cache-Control": cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        if encoding != "identity":
+            response_headers["Content-Encoding"] = encoding
+
+        if_none_match = headers.get("If-None-Match")
+        if if_none_match and _etag_matches(if_none_match, asset.etag(encoding)):
+            del response_headers["Content-Type"]
+            return 304, b"", response_headers
+        return 200, asset.bodies[encoding], response_headers
+
+def build_variants(directory: str = "Client", patterns: tuple[str, ...] = ASSET_PATTERNS) -> list[str]:
+    """
+    Writes .gz, and .br when brotli is installed, next to each asset that is not a page.
+    Pages are versioned at load, so their variants are built then.
+
+    Returns:
+        list[str]: Paths written.
+    """
+    written = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(os.path.join(directory, pattern))):
+            if path.endswith(".html"):
+                continue
+            with open(path, "rb") as asset_file:
+                body = asset_file.read()
+            for encoding, suffix in ENCODINGS:
+                variant = _compress(body, encoding)
+                if variant is None:
+                    continue
+                with open(path + suffix, "wb") as variant_file:
+                    variant_file.write(variant)
+                written.append(path + suffix)
+    return written
+
+if __name__ == "__main__":
+    for path in build_variants(sys.argv[1] if len(sys.argv) > 1 else "Client"):
+        print(path)
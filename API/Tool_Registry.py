@@ -0,0 +1,167 @@
+from __future__ import annotations
+import threading
+import time
+from operator import attrgetter
+from typing import Any, Callable, Dict, List
+import Metrics
+
+"""
+# Tool registry
+Maps the name of each Gemini function declaration to the callable it names and an
+argument validator built from the declaration's parameter schema.
+Everything is resolved once when the registry is built, so dispatching a call from the
+model is a dict lookup, a validation pass and a direct call.
+
+Declaration names are attribute paths.
+"Job.query_jobs" resolves against the Job class.
+"self.candidate.set_skills" resolves against the class of the agent's candidate attribute,
+and the candidate is looked up on the agent at call time.
+"""
+
+class ToolError(ValueError):
+    """
+    Raised when the model calls an unknown function or passes invalid arguments.
+    """
+
+def _check_type(name: str, value: Any, schema: Dict[str, Any]) -> Any:
+    expected = schema.get("type")
+    if expected == "integer":
+        # JSON numbers may arrive as floats
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise ToolError(f"{name} must be an integer")
+    elif expected == "number":
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            raise ToolError(f"{name} must be a number")
+    elif expected == "string":
+        if not isinstance(value, str):
+            raise ToolError(f"{name} must be a string")
+    elif expected == "boolean":
+        if not isinstance(value, bool):
+            raise ToolError(f"{name} must be a boolean")
+    elif expected == "array":
+        if not isinstance(value, (list, tuple)):
+            raise ToolError(f"{name} must be a list")
+        item_schema = schema.get("items", {})
+        value = [_check_type(f"{name}[{i}]", item, item_schema) for i, item in enumerate(value)]
+    return value
+
+class Tool:
+    """
+    One declared function resolved to a callable.
+
+    Args:
+        declaration (dict): Gemini function declaration.
+        receiver (Callable[[Any], Any] | None): Gets the object the function is called on
+            from the agent, or None for functions resolved on a class.
+        function (Callable): The function to call.
+    """
+    def __init__(self, declaration: Dict[str, Any], receiver: Callable[[Any], Any] | None, function: Callable) -> None:
+        self.name: str = declaration["name"]
+        self.declaration = declaration
+        self.__receiver = receiver
+        self.__function = function
+        parameters = declaration.get("parameters", {})
+        self.__properties: Dict[str, Dict[str, Any]] = parameters.get("properties", {})
+        self.__required: List[str] = parameters.get("required", [])
+
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+
+    def validate(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Checks the model's arguments against the declaration and returns them with numbers coerced.
+
+        Raises:
+            ToolError: If an argument is missing, unknown or has the wrong type.
+        """
+        for name in self.__required:
+            if name not in args:
+                raise ToolError(f"{self.name} is missing the required argument {name}")
+        validated = {}
+        for name, value in args.items():
+            if name not in self.__properties:
+                raise ToolError(f"{self.name} has no argument named {name}")
+            validated[name] = _check_type(name, value, self.__properties[name])
+        return validated
+
+    def __call__(self, agent: Any, args: Dict[str, Any]) -> Any:
+        validated = self.validate(args)
+        if self.__receiver is None:
+            return self.__function(**validated)
+        return self.__function(self.__receiver(agent), **validated)
+
+class ToolRegistry:
+    """
+    Dispatch table from declaration names to Tools.
+
+    Args:
+        declarations (List[dict]): Gemini function declarations.
+        roots (Dict[str, type]): The class each declaration name prefix refers to,
+            for example {"Job": Job, "self.candidate": Candidate}.
+    """
+    def __init__(self, declarations: List[Dict[str, Any]], roots: Dict[str, type]) -> None:
+        self.declarations = declarations
+        self.__stats_lock = threading.Lock()
+        self.__tools: Dict[str, Tool] = {}
+        for declaration in declarations:
+            root, attribute = declaration["name"].rsplit(".", 1)
+            if root not in roots:
+                raise ToolError(f"No class registered for {root} in {declaration['name']}")
+            function = getattr(roots[root], attribute)
+            if root == "self":
+                receiver = lambda agent: agent
+            elif root.startswith("self."):
+                receiver = attrgetter(root[len("self."):])
+            else:
+                # Class and static methods are already bound by getattr
+                receiver = None
+            self.__tools[declaration["name"]] = Tool(declaration, receiver, function)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.__tools
+
+    def get(self, name: str) -> Tool:
+        if name not in self.__tools:
+            raise ToolError(f"Unknown function {name}")
+        return self.__tools[name]
+
+    def dispatch(self, agent: Any, name: str, args: Dict[str, Any]) -> Any:
+        """
+        Validates and runs one function call from the model, recording its timing.
+
+        Raises:
+            ToolError: If the function is unknown or the arguments are invalid.
+        """
+        tool = self.get(name)
+        start = time.perf_counter()
+        failed = False
+        try:
+            return tool(agent, args)
+        except Exception:
+            failed = True
+            with self.__stats_lock:
+                tool.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.__stats_lock:
+                tool.calls += 1
+                tool.total_seconds += elapsed
+            Metrics.record_tool_call(name, elapsed, failed)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns the call count, error count and total/mean seconds of every tool.
+        """
+        return {
+            name: {
+                "calls": tool.calls,
+                "errors": tool.errors,
+                "total_seconds": tool.total_seconds,
+                "mean_seconds": tool.total_seconds / tool.calls if tool.calls else 0.0,
+            }
+            for name, tool in self.__tools.items()
+        }
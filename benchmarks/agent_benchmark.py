@@ -0,0 +1,98 @@
+from __future__ import annotations
+import argparse
+import os
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+
+"""
+# Agent benchmark
+Drives synthetic candidate conversations through CandidateAgent with a scripted FakeClient,
+so the agent's own hot paths (context building, tool dispatch, job queries, setters)
+can be measured offline.
+
+Each user turn makes the fake model call setters and query functions, then reply with text.
+Reports p50/p99 per-turn latency, allocations per turn and how the context grows with the
+number of turns.
+
+Run from the repository root: python benchmarks/agent_benchmark.py --conversations 2000 --turns 10
+"""
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "API"))
+from Agent import Candidate, CandidateAgent, Message, SUMMARY_INSTRUCTIONS
+from Fake_Gemini import FakeClient, function_call_response, text_response
+from Gemini_Scheduler import Scheduler
+
+# The function calls the fake model makes on each user turn, cycling
+TURN_CALLS = [
+    [("self.candidate.set_location", {"location": "Atlanta"}), ("self.candidate.set_minimum_salary", {"minimum_salary": 100000})],
+    [("self.candidate.set_ideal_salary", {"ideal_salary": 130000}), ("self.job_history.query_jobs", {"minimum_salary": 100000, "location": "Atlanta", "ideal_salary": 130000})],
+    [("self.candidate.set_skills", {"skills": ["Python", "SQL", "Kubernetes"]}), ("self.candidate.set_position", {"position": "Software Engineer"})],
+    [("self.job_history.semantic_query_jobs", {"description": "backend services with Python and cloud infrastructure"})],
+    [],
+]
+
+_turn_pattern = re.compile(r"From Candidate to Agent: turn (\d+)")
+
+def scripted_model(contents: list) -> object:
+    """
+    Calls functions in reply to a candidate message and answers with text after function results.
+    """
+    if contents and contents[0] == SUMMARY_INSTRUCTIONS:
+        return text_response("The candidate is looking for a software job in Atlanta.")
+    history_lines = str(contents[-1]).rstrip("\n").split("\n")
+    turn = _turn_pattern.match(history_lines[-1])
+    if turn is None or not TURN_CALLS[int(turn.group(1)) % len(TURN_CALLS)]:
+        return text_response("Here is what I found for you. Tell me more about what you are looking for.")
+    return function_call_response(*TURN_CALLS[int(turn.group(1)) % len(TURN_CALLS)])
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def run(conversations: int, turns: int, track_allocations: bool) -> None:
+    client = FakeClient(scripted_model)
+    # The fake model has no quota, so the scheduler only adds its own overhead
+    scheduler = Scheduler(requests_per_minute=10**9, tokens_per_minute=10**12)
+    latencies: list[float] = []
+    allocations: list[int] = []
+    context_characters = [[] for _ in range(turns)]
+
+    if track_allocations:
+        tracemalloc.start()
+    started = time.perf_counter()
+    for conversation in range(conversations):
+        agent = CandidateAgent(Candidate(f"Candidate {conversation}", ""), "benchmark", client=client, scheduler=scheduler)
+        for turn in range(turns):
+            message = Message("Candidate", "Agent", f"turn {turn}: I am looking for a new job.")
+            if track_allocations:
+                tracemalloc.reset_peak()
+                before, _ = tracemalloc.get_traced_memory()
+            turn_started = time.perf_counter()
+            agent.get_response(message)
+            latencies.append(time.perf_counter() - turn_started)
+            if track_allocations:
+                _, peak = tracemalloc.get_traced_memory()
+                allocations.append(peak - before)
+            context_characters[turn].append(sum(len(section) for section in agent.context))
+    elapsed = time.perf_counter() - started
+    if track_allocations:
+        tracemalloc.stop()
+
+    print(f"{conversations} conversations x {turns} turns, {client.calls} model calls in {elapsed:.2f}s")
+    print(f"per-turn latency  p50 {percentile(latencies, 0.5) * 1000:.3f} ms  p99 {percentile(latencies, 0.99) * 1000:.3f} ms  max {max(latencies) * 1000:.3f} ms")
+    if allocations:
+        print(f"per-turn peak allocation  p50 {percentile(allocations, 0.5) / 1024:.1f} KiB  p99 {percentile(allocations, 0.99) / 1024:.1f} KiB")
+    print("context size by turn (characters, mean)")
+    for turn, sizes in enumerate(context_characters):
+        print(f"  turn {turn + 1:3d}  {statistics.mean(sizes):10.0f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--conversations", type=int, default=1000)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--allocations", action="store_true", help="Track per-turn allocations with tracemalloc (slower)")
+    arguments = parser.parse_args()
+    run(arguments.conversations, arguments.turns, arguments.allocations)
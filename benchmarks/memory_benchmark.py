@@ -0,0 +1,116 @@
+from __future__ import annotations
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+from dataclasses import make_dataclass
+from typing import Callable
+
+"""
+# Memory benchmark
+Measures the memory held per Job and per session (a JobDesires, a Qualifications and a
+conversation of Messages) with the slotted, interned classes in API/, against dict-backed
+classes with the same fields as they were before.
+
+Strings are built fresh for every object, the way parsing a CSV or loading rows from
+SQLite produces them, so interning shows up in the numbers.
+
+Run from the repository root: python benchmarks/memory_benchmark.py --jobs 1000000 --sessions 10000
+"""
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "API"))
+from Agent import Message
+from Candidate import JobDesires, Qualifications
+from Job import Job
+
+LOCATIONS = ["Atlanta", "Austin", "Boston", "Chicago", "Denver", "New York", "Remote", "San Francisco", "Seattle"]
+COMPANIES = ["Google", "Microsoft", "Amazon", "Meta", "Apple", "Netflix", "Stripe", "Delta", "Home Depot"]
+SENDERS = [("Candidate", "Agent"), ("Agent", "Candidate"), ("Agent", "API"), ("API", "Agent")]
+
+class DictJob:
+    """
+    Job as it was before slots and interning.
+    """
+    def __init__(self, title: str, company: str, salary: int, location: str, description: str | None = None, id: int | None = None) -> None:
+        self.__id = id
+        self.__title = title
+        self.__company = company
+        self.__salary = salary
+        self.__location = location
+        self.__description = description
+
+DictMessage = make_dataclass("DictMessage", [("sender", str), ("recipient", str), ("content", str)])
+DictJobDesires = make_dataclass("DictJobDesires", [(name, object, None) for name in ("ideal_salary", "minimum_salary", "location", "position", "job_description", "company_culture", "responsibilities")])
+DictQualifications = make_dataclass("DictQualifications", [(name, object, None) for name in ("work_experience", "education", "skills")])
+
+def fresh(text: str) -> str:
+    # A new string object with the same value, as a parser would return
+    return text.encode("utf-8").decode("utf-8")
+
+def measure(build: Callable[[], list]) -> tuple[list, int]:
+    """
+    Returns what build returns and the bytes it still holds.
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    built = build()
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return built, held
+
+def build_jobs(job_class: type, count: int) -> Callable[[], list]:
+    def build() -> list:
+        return [
+            job_class(
+                title=fresh("Software Engineer"),
+                company=fresh(COMPANIES[i % len(COMPANIES)]),
+                salary=80000 + i % 90000,
+                location=fresh(LOCATIONS[i % len(LOCATIONS)]),
+                description=f"Build and operate service number {i} with a small team.",
+                id=i,
+            )
+            for i in range(1, count + 1)
+        ]
+    return build
+
+def build_sessions(message_class: type, desires_class: type, qualifications_class: type, count: int, messages: int) -> Callable[[], list]:
+    def build() -> list:
+        sessions = []
+        for i in range(count):
+            desires = desires_class(ideal_salary=130000, minimum_salary=100000, location=fresh(LOCATIONS[i % len(LOCATIONS)]), position=fresh("Software Engineer"))
+            qualifications = qualifications_class(work_experience=["3 years backend"], education=["BS Computer Science"], skills=["Python", "SQL"])
+            history = [
+                message_class(fresh(SENDERS[m % len(SENDERS)][0]), fresh(SENDERS[m % len(SENDERS)][1]), f"Message {m} of conversation {i}")
+                for m in range(messages)
+            ]
+            sessions.append((desires, qualifications, history))
+        return sessions
+    return build
+
+def report(label: str, count: int, before: int, after: int) -> None:
+    print(f"{label:<10} {count:>9}  before {before / count:7.1f} B/object {before / 2**20:8.1f} MiB"
+          f"   after {after / count:7.1f} B/object {after / 2**20:8.1f} MiB   saved {1 - after / before:5.1%}")
+
+def run(jobs: int, sessions: int, messages: int) -> None:
+    built, before = measure(build_jobs(DictJob, jobs))
+    del built
+    built, after = measure(build_jobs(Job, jobs))
+    del built
+    report("jobs", jobs, before, after)
+
+    built, before = measure(build_sessions(DictMessage, DictJobDesires, DictQualifications, sessions, messages))
+    del built
+    built, after = measure(build_sessions(Message, JobDesires, Qualifications, sessions, messages))
+    del built
+    report("sessions", sessions, before, after)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=1000000)
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=20, help="Messages per session")
+    arguments = parser.parse_args()
+    run(arguments.jobs, arguments.sessions, arguments.messages)
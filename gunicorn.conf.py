@@ -0,0 +1,19 @@
+import os
+
+"""
+# Gunicorn
+The master process preloads the Gemini SDK and the job catalog before forking, so workers
+share them copy-on-write. Each worker then builds its own app, with its own session store
+and client connections.
+
+Run from the repository root with: gunicorn -c gunicorn.conf.py
+"""
+
+wsgi_app = "API:create_app()"
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", "4"))
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+
+def on_starting(server) -> None:
+    import API
+    API.preload()